@@ -28,4 +28,40 @@ register(
     id='ChromeDinoNoBrowser-v0', 
     entry_point='gym_chrome_dino.envs:ChromeDinoEnv', 
     kwargs={'render': False, 'accelerate': False, 'autoscale': False}
-)
\ No newline at end of file
+)
+
+register(
+    id='ChromeDinoSim-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoEnv',
+    kwargs={'render': False, 'accelerate': False, 'autoscale': False, 'backend': 'sim'}
+)
+
+register(
+    id='ChromeDinoGASim-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoGAEnv',
+    kwargs={'render': False, 'accelerate': False, 'autoscale': False, 'backend': 'sim'}
+)
+
+register(
+    id='ChromeDinoGAStructured-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoGAEnv',
+    kwargs={'render': True, 'accelerate': False, 'autoscale': False, 'observation': 'structured'}
+)
+
+register(
+    id='ChromeDinoGAStructuredNoBrowser-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoGAEnv',
+    kwargs={'render': False, 'accelerate': False, 'autoscale': False, 'observation': 'structured'}
+)
+
+register(
+    id='ChromeDinoGAStructuredSim-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoGAEnv',
+    kwargs={'render': False, 'accelerate': False, 'autoscale': False, 'backend': 'sim', 'observation': 'structured'}
+)
+
+register(
+    id='ChromeDinoGASimVec-v0',
+    entry_point='gym_chrome_dino.envs:ChromeDinoSimVecEnv',
+    kwargs={'num_envs': 8, 'accelerate': False}
+)
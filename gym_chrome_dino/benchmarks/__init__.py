@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Throughput benchmarks for the Dino envs.
+
+Every case measures startup time, memory per env (RSS of the process and
+its children, e.g. Chrome), reset latency, step latency and env steps per
+second, and the results are written to a JSON file to compare commits:
+
+    python -m gym_chrome_dino.benchmarks --steps 1000 -o results.json
+    python -m gym_chrome_dino.benchmarks --compare old.json results.json
+
+Cases that need Chrome are skipped when no Chrome binary is found; the
+sim backend and the mock DevTools endpoint run offline.
+"""
+
+import argparse
+import collections
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+import gym
+from gym.vector import VectorEnv
+
+from gym_chrome_dino.utils.helpers import process_tree_rss
+
+Case = collections.namedtuple('Case', ['name', 'make', 'needs'])
+
+
+def chrome_available():
+    from gym_chrome_dino.game.cdp import CDPError, find_chrome
+    try:
+        find_chrome()
+        return True
+    except CDPError:
+        return False
+
+
+def _make(env_id, wrap=None, **kwargs):
+    def make():
+        import gym_chrome_dino  # registers the env ids
+        env = gym.make(env_id, **kwargs)
+        return wrap(env) if wrap is not None else env
+    return make
+
+
+def _make_dino(env):
+    from gym_chrome_dino.utils.wrappers import make_dino
+    return make_dino(env, timer=False)
+
+
+def _make_sim_vec(num_envs, **kwargs):
+    def make():
+        from gym_chrome_dino.envs import ChromeDinoSimVecEnv
+        return ChromeDinoSimVecEnv(num_envs, **kwargs)
+    return make
+
+
+def _make_subproc(env_id, num_envs, **kwargs):
+    def make():
+        from gym_chrome_dino.envs import SubprocChromeDinoVecEnv, make_env_fns
+        return SubprocChromeDinoVecEnv(make_env_fns(env_id, num_envs, **kwargs))
+    return make
+
+
+def _mock_handler(n_obstacles=3):
+    state = [50, 93, 6, 0, 1, 0, 0, 0, 0, 0] + [0, 600, 150, 0, 0, 0] * n_obstacles
+
+    def handler(method, params):
+        if method != 'Runtime.evaluate':
+            return {}
+        expression = params['expression']
+        if 'return [__dinoState' in expression:
+            return {'result': {'type': 'object', 'value': [state, None, None, 1]}}
+        if '__dinoState' in expression:
+            return {'result': {'type': 'object', 'value': state}}
+        return {'result': {'type': 'boolean', 'value': True}}
+    return handler
+
+
+def _make_mock_cdp():
+    def make():
+        from gym_chrome_dino.envs import ChromeDinoGAEnv
+        from gym_chrome_dino.game.cdp import CDPDinoGame
+        from gym_chrome_dino.game.mock_cdp import MockCDPServer
+        server = MockCDPServer(_mock_handler())
+        env = ChromeDinoGAEnv(False, False, False, game=CDPDinoGame(ws_url=server.ws_url))
+        close = env.close
+
+        def close_all():
+            close()
+            server.close()
+        env.close = close_all
+        return env
+    return make
+
+
+def default_cases():
+    cases = [
+        Case('mock/cdp-ga', _make_mock_cdp(), None),
+        Case('sim/vec-8', _make_sim_vec(8), None),
+        Case('sim/vec-64', _make_sim_vec(64), None),
+        Case('sim/vec-256', _make_sim_vec(256), None),
+        Case('sim/vec-64-pixels', _make_sim_vec(64, observation='pixels'), None),
+        Case('sim/subproc-4', _make_subproc('ChromeDinoGASim-v0', 4), None),
+        Case('chrome/subproc-4', _make_subproc('ChromeDinoGANoBrowser-v0', 4), 'chrome'),
+    ]
+    for backend in ('sim', 'chrome', 'cdp'):
+        needs = None if backend == 'sim' else 'chrome'
+        cases += [
+            Case(backend + '/ga', _make('ChromeDinoGANoBrowser-v0', backend=backend), needs),
+            Case(backend + '/pixels', _make('ChromeDinoNoBrowser-v0', backend=backend), needs),
+            Case(backend + '/pixels-make_dino', _make('ChromeDinoNoBrowser-v0', _make_dino, backend=backend), needs),
+            Case(backend + '/gray-make_dino',
+                 _make('ChromeDinoNoBrowser-v0', _make_dino, backend=backend, capture='gray'), needs),
+            Case(backend + '/ga-frame_skip-4',
+                 _make('ChromeDinoGANoBrowser-v0', backend=backend, lockstep=True, frames_per_step=4), needs),
+            Case(backend + '/pixels-frame_skip-4',
+                 _make('ChromeDinoNoBrowser-v0', backend=backend, lockstep=True, frame_skip=4), needs),
+        ]
+        if backend != 'sim':
+            cases.append(Case(backend + '/pixels-rgba', _make('ChromeDinoNoBrowser-v0', backend=backend,
+                                                              capture='rgba'), needs))
+    return cases
+
+
+def _summary(latencies):
+    latencies = np.asarray(latencies)
+    return {
+        'mean': float(latencies.mean()),
+        'p50': float(np.percentile(latencies, 50)),
+        'p99': float(np.percentile(latencies, 99)),
+    }
+
+
+def run_case(case, steps=1000, resets=10, seed=0):
+    rss = process_tree_rss()
+    start = time.perf_counter()
+    env = case.make()
+    startup = time.perf_counter() - start
+    try:
+        vector = isinstance(env, VectorEnv)
+        num_envs = env.num_envs if vector else 1
+        env.seed(seed)
+        env.action_space.seed(seed)
+        rss_env = process_tree_rss()
+
+        reset_times = []
+        for _ in range(resets):
+            start = time.perf_counter()
+            env.reset()
+            reset_times.append(time.perf_counter() - start)
+
+        step_times = []
+        episodes = 0
+        begin = time.perf_counter()
+        for _ in range(steps):
+            action = env.action_space.sample()
+            start = time.perf_counter()
+            _, _, done, _ = env.step(action)
+            step_times.append(time.perf_counter() - start)
+            if vector:
+                episodes += int(np.sum(done))
+            elif done:
+                episodes += 1
+                env.reset()
+        elapsed = time.perf_counter() - begin
+    finally:
+        env.close()
+    return {
+        'num_envs': num_envs,
+        'startup_s': startup,
+        'memory_per_env_mb': (rss_env - rss) / num_envs / 2 ** 20 if rss is not None else None,
+        'reset_s': _summary(reset_times),
+        'step_s': _summary(step_times),
+        'steps_per_s': steps * num_envs / elapsed,
+        'episodes': episodes,
+    }
+
+
+def check_noop_episode(env_id='ChromeDinoGASim-v0', max_steps=10000):
+    """Assert that an episode of NOOP actions ends in a crash, i.e. the game runs."""
+    env = _make(env_id)()
+    try:
+        env.reset()
+        for steps in range(1, max_steps + 1):
+            _, _, done, _ = env.step(0)
+            if done:
+                return steps
+    finally:
+        env.close()
+    raise AssertionError('{}: no crash after {} NOOP steps'.format(env_id, max_steps))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases, steps=1000, resets=10, log=print):
+    has_chrome = chrome_available()
+    results = {}
+    for case in cases:
+        if case.needs == 'chrome' and not has_chrome:
+            results[case.name] = {'skipped': 'Chrome not found'}
+            log('{:<28} skipped (Chrome not found)'.format(case.name))
+            continue
+        try:
+            result = run_case(case, steps, resets)
+        except Exception as e:
+            results[case.name] = {'error': '{}: {}'.format(type(e).__name__, e)}
+            log('{:<28} error: {}'.format(case.name, results[case.name]['error']))
+            continue
+        results[case.name] = result
+        log('{:<28} {:>12.1f} steps/s  step p50 {:8.3f} ms  reset {:8.3f} ms  startup {:6.2f} s'.format(
+            case.name, result['steps_per_s'], result['step_s']['p50'] * 1e3, result['reset_s']['mean'] * 1e3,
+            result['startup_s']))
+    return {
+        'commit': _git_commit(),
+        'date': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'steps': steps,
+        'results': results,
+    }
+
+
+def compare(old, new, log=print):
+    """Print the steps/s ratio new / old of the cases both files have."""
+    for name, result in new['results'].items():
+        before = old['results'].get(name, {})
+        if 'steps_per_s' in result and 'steps_per_s' in before:
+            log('{:<28} {:>12.1f} -> {:>12.1f} steps/s  x{:.2f}'.format(
+                name, before['steps_per_s'], result['steps_per_s'], result['steps_per_s'] / before['steps_per_s']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='chrome-dino-benchmark', description=__doc__.split('\n')[0])
+    parser.add_argument('-k', '--filter', default='*', help='glob over case names, e.g. "sim/*"')
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--resets', type=int, default=10)
+    parser.add_argument('-o', '--output', help='JSON file for the results')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--check', action='store_true', help='check that NOOP episodes of the sim envs end')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    args = parser.parse_args(argv)
+
+    if args.check:
+        for env_id in ('ChromeDinoSim-v0', 'ChromeDinoGASim-v0'):
+            print('{:<28} NOOP episode done after {} steps'.format(env_id, check_noop_episode(env_id)))
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        return
+    cases = [c for c in default_cases() if fnmatch.fnmatch(c.name, args.filter)]
+    if args.list:
+        for case in cases:
+            print(case.name + (' (needs Chrome)' if case.needs else ''))
+        return
+    report = run(cases, args.steps, args.resets)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
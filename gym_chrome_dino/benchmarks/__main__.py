@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+from gym_chrome_dino.benchmarks import main
+
+main()
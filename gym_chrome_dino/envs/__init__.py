@@ -5,3 +5,8 @@
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
 from gym_chrome_dino.envs.chrome_dino_env import ChromeDinoEnv, ChromeDinoGAEnv
+from gym_chrome_dino.envs.chrome_dino_vec_env import ChromeDinoSimVecEnv
+from gym_chrome_dino.envs.subproc_vec_env import SubprocChromeDinoVecEnv, make_env_fns
+from gym_chrome_dino.envs.async_env import AsyncChromeDinoEnv, close_all, make_all, reset_all, step_all
+from gym_chrome_dino.envs.server import EnvClient, EnvServer, RemoteEnv
+from gym_chrome_dino.envs.supervisor import SupervisedEnv
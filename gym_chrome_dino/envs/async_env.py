@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import gym
+
+from gym_chrome_dino.game.async_game import AsyncProxy
+
+
+class AsyncChromeDinoEnv(AsyncProxy):
+    """A Dino env with `await env.step(action)` and `await env.reset()`.
+
+    Calls run on a thread owned by the env, so stepping many envs with
+    `step_all` overlaps their browser round trips on one event loop.
+    """
+
+    def __init__(self, env, executor=None):
+        AsyncProxy.__init__(self, env, executor)
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+
+    @property
+    def env(self):
+        return self._target
+
+    @classmethod
+    async def make(cls, env_id, **kwargs):
+        """Create a registered env off the event loop thread."""
+        import gym_chrome_dino  # registers the env ids
+        executor = ThreadPoolExecutor(1)
+        loop = asyncio.get_running_loop()
+        env = await loop.run_in_executor(executor, functools.partial(gym.make, env_id, **kwargs))
+        return cls(env, executor)
+
+    async def step(self, action):
+        return await self._run(self._target.step, action)
+
+    async def reset(self, **kwargs):
+        return await self._run(self._target.reset, **kwargs)
+
+
+async def make_all(env_id, num_envs, **kwargs):
+    """Launch `num_envs` envs concurrently."""
+    return list(await asyncio.gather(*[AsyncChromeDinoEnv.make(env_id, **kwargs) for _ in range(num_envs)]))
+
+
+async def step_all(envs, actions):
+    """Step every env at once, returns lists of (observations, rewards, dones, infos)."""
+    results = await asyncio.gather(*[env.step(action) for env, action in zip(envs, actions)])
+    observations, rewards, dones, infos = zip(*results)
+    return list(observations), list(rewards), list(dones), list(infos)
+
+
+async def reset_all(envs, **kwargs):
+    return list(await asyncio.gather(*[env.reset(**kwargs) for env in envs]))
+
+
+async def close_all(envs):
+    await asyncio.gather(*[env.close() for env in envs])
@@ -4,71 +4,103 @@
 # Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
-import base64
-import io
 import numpy as np
 import os
 from collections import deque
-from PIL import Image
 
 import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
 
-from gym_chrome_dino.game import DinoGame
-from gym_chrome_dino.utils.helpers import rgba2rgb
+from gym_chrome_dino.game import BACKENDS
+from gym_chrome_dino.game.pool import POOL
+from gym_chrome_dino.game.state import ga_observation, structured_bounds, structured_observation
+from gym_chrome_dino.utils.profiling import PROFILER
+from gym_chrome_dino.utils.recording import EpisodeRecorder
 
 
-class ChromeDinoEnv(gym.Env):
+class ChromeDinoBaseEnv(gym.Env):
+    """What ChromeDinoEnv and ChromeDinoGAEnv share: the game, its pool,
+    snapshots and recording. Subclasses set the spaces and `current_frame`
+    and implement `_observe` and `step`.
+    """
     metadata = {'render.modes': ['rgb_array'], 'video.frames_per_second': 10}
 
-    def __init__(self, render, accelerate, autoscale):
-        self.game = DinoGame(render, accelerate)
-        image_size = self._observe().shape
-        self.observation_space = spaces.Box(
-            low=0, high=255, shape=(150, 600, 3), dtype=np.uint8
-        )
-        self.action_space = spaces.Discrete(2)
+    def __init__(self, render, accelerate, autoscale, backend, game, record_dir, pool, frame_skip, game_kwargs):
+        # with pool=True the game comes from (and goes back to) the process-wide pool
+        self.pooled = game is None and pool
+        # how the game is launched, None for a game passed in (see SupervisedEnv)
+        self.game_config = (backend, render, accelerate, autoscale, dict(game_kwargs)) if game is None else None
+        if game is None and pool:
+            game = POOL.acquire(backend, render, accelerate, autoscale, **game_kwargs)
+        elif game is None:
+            game = BACKENDS[backend](render, accelerate, autoscale, **game_kwargs)
+        self.game = game
+        self.record_dir = record_dir  # episodes reset with record=True are written here
+        self.recorder = None
+        # an action is repeated for frame_skip game steps in one call, see DinoGame.step
+        self.frame_skip = frame_skip
         self.gametime_reward = 0.1
         self.gameover_penalty = -1
-        self.current_frame = self.observation_space.low
         self._action_set = [0, 1, 2]
 
-    def _observe(self):
-        s = self.game.get_canvas()
-        b = io.BytesIO(base64.b64decode(s))
-        i = Image.open(b)
-        i = rgba2rgb(i)
-        a = np.array(i)
-        self.current_frame = a
+    def _reset_state(self):
+        # the game state recorded with the reset observation
+        return self.game.get_state()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        if hasattr(self.game, 'seed'):
+            self.game.seed(seed)
+        return [seed]
+
+    def clone_state(self):
+        """Snapshot of the game and the current observation."""
+        return {
+            'game': self.game.save_state(),
+            'state': getattr(self, 'state', None),
+            'observation': np.copy(self.current_frame),
+        }
+
+    def restore_state(self, snapshot):
+        """Continue from a clone_state snapshot, returns its observation."""
+        self.game.load_state(snapshot['game'])
+        self.state = snapshot['state']
+        self.current_frame = np.copy(snapshot['observation'])
         return self.current_frame
 
-    def step(self, action):
-        if action == 1:
-            self.game.press_up()
-        if action == 2:
-            self.game.press_down()
-        if action == 3:
-            self.game.press_space()
-        observation = self._observe()
-        reward = self.gametime_reward
-        done = False
-        info = {}
-        if self.game.is_crashed():
-            reward = self.gameover_penalty
-            done = True
-        return observation, reward, done, info
-
     def reset(self, record=False):
         self.game.restart()
-        return self._observe()
+        observation = self._observe()
+        if record:
+            self._recorder().begin(observation, self._reset_state())
+        elif self.recorder is not None:
+            self.recorder.end()
+        return observation
+
+    def _record(self, observation, action, reward, done):
+        if self.recorder is not None and self.recorder.recording:
+            self.recorder.add(observation, action, reward, done, self.state)
+            if done:
+                self.recorder.end()
+
+    def _recorder(self):
+        if self.recorder is None:
+            assert self.record_dir is not None, 'Pass record_dir to record episodes.'
+            self.recorder = EpisodeRecorder(self.record_dir)
+        return self.recorder
 
     def render(self, mode='rgb_array', close=False):
         assert mode == 'rgb_array', 'Only supports rgb_array mode.'
         return self.current_frame
 
     def close(self):
-        self.game.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.pooled:
+            POOL.release(self.game)
+        else:
+            self.game.close()
 
     def get_score(self):
         return self.game.get_score()
@@ -83,11 +115,56 @@ class ChromeDinoEnv(gym.Env):
         return [ACTION_MEANING[i] for i in self._action_set]
 
 
-class ChromeDinoGAEnv(gym.Env):
-    metadata = {'render.modes': ['rgb_array'], 'video.frames_per_second': 10}
+class ChromeDinoEnv(ChromeDinoBaseEnv):
+    def __init__(self, render, accelerate, autoscale, capture='png', frame_size=(160, 80), crop=None,
+                 backend='chrome', game=None, record_dir=None, pool=False, frame_skip=1, **game_kwargs):
+        game_kwargs.update(capture=capture, frame_size=frame_size, crop=crop)
+        ChromeDinoBaseEnv.__init__(self, render, accelerate, autoscale, backend, game, record_dir, pool,
+                                   frame_skip, game_kwargs)
+        image_size = self._observe().shape
+        if self.game.capture == 'gray':
+            # same contract as WarpFrame(env, *frame_size)
+            shape = (self.game.frame_size[1], self.game.frame_size[0], 1)
+        else:
+            shape = (150, 600, 3)
+        self.observation_space = spaces.Box(
+            low=0, high=255, shape=shape, dtype=np.uint8
+        )
+        self.action_space = spaces.Discrete(2)
+        self.current_frame = self.observation_space.low
+
+    def _observe(self):
+        self.current_frame = self.game.get_frame()
+        return self.current_frame
+
+    def step(self, action):
+        timings = PROFILER.begin_step()
+        with PROFILER.stage('env.step'):
+            self.state, self.current_frame = self.game.step(ACTION_KEYS.get(action), frame=True,
+                                                            repeat=self.frame_skip)
+        observation = self.current_frame
+        reward = self.gametime_reward * self.game.repeats
+        done = False
+        info = {}
+        stream = getattr(self.game, 'stream', None)
+        if stream is not None:
+            info.update(frame_id=stream.last.frame_id, frame_timestamp=stream.last.timestamp,
+                        dropped_frames=stream.dropped, stale_frame=self.game.stale_frame)
+        if timings is not None:
+            info['timings'] = timings
+        if self.state['crashed']:
+            reward = self.gametime_reward * (self.game.repeats - 1) + self.gameover_penalty
+            done = True
+        self._record(observation, action, reward, done)
+        return observation, reward, done, info
+
 
-    def __init__(self, render, accelerate, autoscale):
-        self.game = DinoGame(render, accelerate)
+class ChromeDinoGAEnv(ChromeDinoBaseEnv):
+    def __init__(self, render, accelerate, autoscale, backend='chrome', game=None, record_dir=None, pool=False,
+                 frame_skip=1, observation='features', normalize=False, **game_kwargs):
+        assert observation in ('features', 'structured'), 'Unsupported observation: ' + str(observation)
+        ChromeDinoBaseEnv.__init__(self, render, accelerate, autoscale, backend, game, record_dir, pool,
+                                   frame_skip, game_kwargs)
 
         """
             Limits of observation space:
@@ -107,74 +184,51 @@ class ChromeDinoGAEnv(gym.Env):
             high=np.array([600.0, 150.0, 600.0, 150.0, 200.0, 100.0, 100.0]),
             dtype=np.float32
         )
+        # observation='structured' has the next game.n_obstacles obstacles, see structured_observation
+        self.observation = observation
+        self.normalize = normalize
+        if observation == 'structured':
+            low, high = structured_bounds(self.game.n_obstacles)
+            if normalize:
+                low, high = np.zeros_like(low), np.ones_like(high)
+            self.observation_space = spaces.Box(low=low, high=high, dtype=np.float32)
 
         self.action_space = spaces.Discrete(3)
-        self.gametime_reward = 0.1
-        self.gameover_penalty = -1
         self.current_frame = self.observation_space.low
-        self._action_set = [0, 1, 2]
 
     def _observe(self):
+        self.state = self.game.get_state()
+        self.current_frame = self._features(self.state)
+        return self.current_frame
 
-        obstacle_x_distance = float(self.game.get_nearest_obstacle_x_distance())
-        obstacle_y_distance = float(self.game.get_nearest_obstacle_y_distance())
-        dino_position_x = float(self.game.get_dino_x_position())
-        dino_position_y = float(self.game.get_dino_y_position())
-        next_obstacle_width = float(self.game.get_nearest_obstacle_width())
-        next_obstacle_height = float(self.game.get_nearest_obstacle_height())
-        speed = float(self.game.get_speed())
-
-        self.current_frame = np.array([
-            obstacle_x_distance,
-            obstacle_y_distance,
-            dino_position_x,
-            dino_position_y,
-            next_obstacle_width,
-            next_obstacle_height,
-            speed
-        ])
+    def _reset_state(self):
+        return self.state  # read by _observe
 
-        return self.current_frame
+    def _features(self, state):
+        if self.observation == 'structured':
+            return structured_observation(state, normalize=self.normalize)
+        return ga_observation(state)
 
     def step(self, action):
-        if action == 1:
-            self.game.press_up()
-        if action == 2:
-            self.game.press_down()
-        if action == 3:
-            self.game.press_space()
-        observation = self._observe()
+        timings = PROFILER.begin_step()
+        with PROFILER.stage('env.step'):
+            self.state, _ = self.game.step(ACTION_KEYS.get(action), repeat=self.frame_skip)
+        observation = self.current_frame = self._features(self.state)
         # reward = self.gametime_reward
         done = False
         info = {}
-        if self.game.is_crashed():
+        if timings is not None:
+            info['timings'] = timings
+        if self.state['crashed']:
             # reward = self.gameover_penalty
             done = True
-        reward = self.game.get_score()
+        reward = int(self.state['score'])
+        self._record(observation, action, reward, done)
         return observation, reward, done, info
 
-    def reset(self, record=False):
-        self.game.restart()
-        return self._observe()
-
-    def render(self, mode='rgb_array', close=False):
-        assert mode == 'rgb_array', 'Only supports rgb_array mode.'
-        return self.current_frame
-
-    def close(self):
-        self.game.close()
-
-    def get_score(self):
-        return self.game.get_score()
-
-    def set_acceleration(self, enable):
-        if enable:
-            self.game.restore_parameter('config.ACCELERATION')
-        else:
-            self.game.set_parameter('config.ACCELERATION', 0)
-
-    def get_action_meanings(self):
-        return [ACTION_MEANING[i] for i in self._action_set]
+    def evaluate(self, policies, max_steps=10000, seed=None):
+        """Fitness of each policy over one episode run by the game, see DinoGame.evaluate."""
+        return self.game.evaluate(policies, max_steps=max_steps, seed=seed)
 
 
 ACTION_MEANING = {
@@ -183,3 +237,9 @@ ACTION_MEANING = {
     2: "DOWN",
     3: "SPACE",
 }
+
+ACTION_KEYS = {
+    1: 'UP',
+    2: 'DOWN',
+    3: 'SPACE',
+}
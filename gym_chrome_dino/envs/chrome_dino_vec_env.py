@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import numpy as np
+
+import gym
+from gym import spaces
+from gym.vector import VectorEnv
+
+from gym_chrome_dino.game.dino_vec_sim import VecDinoSim
+
+
+class ChromeDinoSimVecEnv(VectorEnv):
+    """N simulated games in lockstep, stepped by one batched call.
+
+    Observations use the ChromeDinoGAEnv 7-feature layout, or grayscale
+    frames of `frame_size` with observation='pixels'. Games that crash are
+    reset right away; their last observation is kept in
+    info['terminal_observation'].
+    """
+
+    def __init__(self, num_envs=8, accelerate=False, frames_per_step=1, observation='features',
+                 frame_size=(160, 80), seed=None):
+        assert observation in ('features', 'pixels'), 'Unsupported observation: ' + str(observation)
+        self.sim = VecDinoSim(num_envs, accelerate=accelerate, frames_per_step=frames_per_step, seed=seed)
+        self.observation = observation
+        self.frame_size = tuple(frame_size)
+        if observation == 'pixels':
+            observation_space = spaces.Box(
+                low=0, high=255, shape=(frame_size[1], frame_size[0], 1), dtype=np.uint8
+            )
+        else:
+            observation_space = spaces.Box(
+                low=np.array([-20.0, -20.0, 0.0, 0.0, 0.0, 0.0, 0.0], dtype=np.float32),
+                high=np.array([600.0, 150.0, 600.0, 150.0, 200.0, 100.0, 100.0], dtype=np.float32),
+                dtype=np.float32
+            )
+        VectorEnv.__init__(self, num_envs, observation_space, spaces.Discrete(3))
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+
+    def _observe(self):
+        if self.observation == 'pixels':
+            return self.sim.render(*self.frame_size)
+        return self.sim.ga_observation()
+
+    def seed(self, seed=None):
+        return [self.sim.seed(seed)]
+
+    def reset_async(self, seed=None, return_info=False, options=None):
+        # an int seed gives env i the seed `seed + i`, like gym's vector envs; as the games draw
+        # their obstacles from one batched generator, the seeds of all envs seed it together
+        if seed is not None:
+            self.sim.seed(list(seed) if isinstance(seed, (list, tuple)) else [seed + i for i in range(self.num_envs)])
+
+    def reset_wait(self, seed=None, return_info=False, options=None):
+        self.sim.reset()
+        if return_info:
+            return self._observe(), [{} for _ in range(self.num_envs)]
+        return self._observe()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions)
+
+    def step_wait(self, *args, **kwargs):
+        scores, dones = self.sim.step(self._actions)
+        infos = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            terminal = self._observe()
+            for i in np.flatnonzero(dones):
+                infos[i]['terminal_observation'] = terminal[i]
+            self.sim.reset(dones)
+        return self._observe(), scores.astype(np.float32), dones, infos
+
+    def get_score(self):
+        return self.sim.get_score()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A server hosting a pool of Dino envs for clients in other processes.
+
+The server owns the envs (and so the browsers); clients lease some of them
+with `attach`, step and reset them in batches and give them back with
+`detach` or by disconnecting. It listens on a Unix socket (a path) or TCP
+(a (host, port) tuple):
+
+    chrome-dino-server ChromeDinoNoBrowser-v0 -n 8 --unix /tmp/dino.sock
+
+Every message is a header of two little-endian uint32, the lengths of a
+JSON part and of a binary part, followed by both. Observations travel in
+the binary part as the raw bytes of the observation space dtype, one after
+the other; nothing is pickled.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import gym
+from gym import spaces
+
+HEADER = struct.Struct('<II')
+
+# the only env methods clients may call; others (close, set_parameter, ...) would affect other clients
+CALLABLE_METHODS = ('get_score', 'get_action_meanings')
+
+
+class EnvServerError(Exception):
+    pass
+
+
+def _json_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError('{} is not JSON serializable'.format(type(o).__name__))
+
+
+def send_message(sock, meta, data=None):
+    """Send a JSON-able `meta` and an optional array as one message."""
+    meta = json.dumps(meta, default=_json_default).encode()
+    body = memoryview(np.ascontiguousarray(data)).cast('B') if data is not None else b''
+    message = bytearray(HEADER.size + len(meta) + len(body))
+    HEADER.pack_into(message, 0, len(meta), len(body))
+    message[HEADER.size:HEADER.size + len(meta)] = meta
+    message[HEADER.size + len(meta):] = body
+    sock.sendall(message)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    pos = 0
+    while pos < n:
+        k = sock.recv_into(view[pos:])
+        if not k:
+            raise EOFError('connection closed')
+        pos += k
+    return buf
+
+
+def recv_message(sock):
+    """Receive a message as (meta, binary part)."""
+    meta_size, data_size = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    meta = json.loads(_recv_exact(sock, meta_size).decode())
+    return meta, _recv_exact(sock, data_size)
+
+
+def space_to_json(space):
+    if isinstance(space, spaces.Discrete):
+        return {'type': 'Discrete', 'n': int(space.n)}
+    if isinstance(space, spaces.Box):
+        return {'type': 'Box', 'low': space.low, 'high': space.high, 'dtype': np.dtype(space.dtype).str}
+    raise EnvServerError('Unsupported space: ' + str(space))
+
+
+def space_from_json(d):
+    if d['type'] == 'Discrete':
+        return spaces.Discrete(d['n'])
+    dtype = np.dtype(d['dtype'])
+    return spaces.Box(low=np.array(d['low'], dtype=dtype), high=np.array(d['high'], dtype=dtype), dtype=dtype)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.leased = set()
+
+    def handle(self):
+        server = self.server.env_server
+        while True:
+            try:
+                meta, _ = recv_message(self.request)
+            except (EOFError, OSError):
+                break
+            try:
+                reply, data = server.handle(self.leased, meta)
+            except Exception as e:
+                reply, data = {'error': '{}: {}'.format(type(e).__name__, e)}, None
+            send_message(self.request, reply, data)
+
+    def finish(self):
+        self.server.env_server.detach(self.leased, list(self.leased))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EnvServer():
+    """Serves the envs made by `env_fns` on `address`.
+
+    All envs must have the same spaces. The envs of one batched request are
+    stepped in parallel on a thread pool, which suits envs waiting on their
+    browser.
+    """
+
+    def __init__(self, env_fns, address):
+        self.envs = [env_fn() for env_fn in env_fns]
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+        for env in self.envs:
+            assert env.observation_space == self.observation_space, 'All envs must have the same spaces'
+        self.dtype = np.dtype(self.observation_space.dtype)
+        self.free = list(range(len(self.envs)))
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(len(self.envs))
+        self.address = address
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(tuple(address), _Handler)
+            self.address = self._server.server_address  # the port chosen for port 0
+        self._server.env_server = self
+        self._thread = None
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def detach(self, leased, ids):
+        with self._lock:
+            for i in ids:
+                if i in leased:
+                    leased.discard(i)
+                    self.free.append(i)
+
+    def _observations(self, observations):
+        out = np.empty((len(observations),) + self.observation_space.shape, dtype=self.dtype)
+        for i, obs in enumerate(observations):
+            out[i] = obs
+        return out
+
+    def handle(self, leased, meta):
+        op = meta['op']
+        if op == 'attach':
+            n = meta['num_envs']
+            with self._lock:
+                if n > len(self.free):
+                    raise EnvServerError('{} envs requested, {} free'.format(n, len(self.free)))
+                ids, self.free = self.free[:n], self.free[n:]
+            leased.update(ids)
+            return {'ids': ids, 'observation_space': space_to_json(self.observation_space),
+                    'action_space': space_to_json(self.action_space)}, None
+        if op == 'detach':
+            self.detach(leased, meta['ids'])
+            return {}, None
+        ids = meta['ids']
+        for i in ids:
+            if i not in leased:
+                raise EnvServerError('env {} is not attached'.format(i))
+        envs = [self.envs[i] for i in ids]
+        if op == 'reset':
+            kwargs = meta.get('kwargs', {})
+            return {}, self._observations(list(self._executor.map(lambda env: env.reset(**kwargs), envs)))
+        if op == 'step':
+            results = list(self._executor.map(lambda env, action: env.step(action), envs, meta['actions']))
+            observations, rewards, dones, infos = zip(*results)
+            return {'rewards': rewards, 'dones': dones, 'infos': infos}, self._observations(observations)
+        if op == 'call':
+            method = meta['method']
+            if method.startswith('_') or method not in CALLABLE_METHODS:
+                raise EnvServerError('Method not allowed: ' + str(method))
+            results = [getattr(env.unwrapped, method)(*meta['args']) for env in envs]
+            return {'results': results}, None
+        raise EnvServerError('Unknown op: ' + str(op))
+
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+        self._executor.shutdown()
+        for env in self.envs:
+            env.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EnvClient():
+    """A connection to an EnvServer; steps and resets are batched over env ids."""
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+        else:
+            self.sock = socket.create_connection(tuple(address))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.observation_space = self.action_space = None
+
+    def _request(self, meta):
+        send_message(self.sock, meta)
+        reply, data = recv_message(self.sock)
+        if 'error' in reply:
+            raise EnvServerError(reply['error'])
+        return reply, data
+
+    def _observations(self, data, n):
+        space = self.observation_space
+        return np.frombuffer(data, dtype=space.dtype).reshape((n,) + space.shape)
+
+    def attach(self, num_envs=1):
+        """Lease `num_envs` envs of the server, returns their ids."""
+        reply, _ = self._request({'op': 'attach', 'num_envs': num_envs})
+        self.observation_space = space_from_json(reply['observation_space'])
+        self.action_space = space_from_json(reply['action_space'])
+        return reply['ids']
+
+    def detach(self, ids):
+        self._request({'op': 'detach', 'ids': list(ids)})
+
+    def reset(self, ids, **kwargs):
+        """Observations of the reset envs, an (n, ...) array."""
+        _, data = self._request({'op': 'reset', 'ids': list(ids), 'kwargs': kwargs})
+        return self._observations(data, len(ids))
+
+    def step(self, ids, actions):
+        """(observations, rewards, dones, infos) of one step of every env in `ids`."""
+        reply, data = self._request({'op': 'step', 'ids': list(ids), 'actions': [int(a) for a in actions]})
+        return (self._observations(data, len(ids)), np.array(reply['rewards'], dtype=np.float32),
+                np.array(reply['dones'], dtype=bool), reply['infos'])
+
+    def call(self, ids, method, *args):
+        """Call one of CALLABLE_METHODS of the unwrapped envs, e.g. call(ids, 'get_score')."""
+        reply, _ = self._request({'op': 'call', 'ids': list(ids), 'method': method, 'args': list(args)})
+        return reply['results']
+
+    def close(self):
+        self.sock.close()
+
+
+class RemoteEnv(gym.Env):
+    """One env leased from an EnvServer, used like a local env."""
+
+    def __init__(self, address):
+        self.client = EnvClient(address)
+        self.id = self.client.attach(1)[0]
+        self.observation_space = self.client.observation_space
+        self.action_space = self.client.action_space
+
+    def reset(self, **kwargs):
+        return self.client.reset([self.id], **kwargs)[0]
+
+    def step(self, action):
+        observations, rewards, dones, infos = self.client.step([self.id], [action])
+        return observations[0], float(rewards[0]), bool(dones[0]), infos[0]
+
+    def get_score(self):
+        return self.client.call([self.id], 'get_score')[0]
+
+    def close(self):
+        self.client.close()
+
+
+def main(argv=None):
+    from gym_chrome_dino.envs.subproc_vec_env import make_env_fns
+    parser = argparse.ArgumentParser(prog='chrome-dino-server', description=__doc__.split('\n')[0])
+    parser.add_argument('env_id')
+    parser.add_argument('-n', '--num-envs', type=int, default=4)
+    parser.add_argument('--unix', help='Unix socket path')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    args = parser.parse_args(argv)
+    address = args.unix or (args.host, args.port)
+    server = EnvServer(make_env_fns(args.env_id, args.num_envs), address)
+    print('Serving {} x {} on {}'.format(args.num_envs, args.env_id, server.address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
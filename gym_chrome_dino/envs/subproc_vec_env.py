@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A vector env running one Dino env (and thus one DinoGame) per process.
+
+Workers write observations into a shared-memory ring buffer with
+`ring_size` slots per env and only send the slot index, reward, done and
+info through their pipe, so frames are never pickled. Steps are issued to
+all workers at once with `step_async` and collected with `step_wait`;
+finished episodes are reset inside the worker.
+"""
+
+import functools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import gym
+from gym.vector import VectorEnv
+
+
+def _make_env(env_id, kwargs):
+    import gym_chrome_dino  # registers the env ids in the worker
+    return gym.make(env_id, **kwargs)
+
+
+def make_env_fns(env_id, num_envs, **kwargs):
+    """Picklable env constructors for SubprocChromeDinoVecEnv."""
+    return [functools.partial(_make_env, env_id, kwargs) for _ in range(num_envs)]
+
+
+def _worker(index, pipe, env_fn, ring_size):
+    env = env_fn()
+    pipe.send((env.observation_space, env.action_space))
+    shm = None
+    try:
+        name, shape, dtype = pipe.recv()
+        shm = shared_memory.SharedMemory(name=name)
+        ring = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[index]
+        cursor = 0
+
+        def write(obs):
+            nonlocal cursor
+            slot = cursor
+            ring[slot] = obs
+            cursor = (cursor + 1) % ring_size
+            return slot
+
+        while True:
+            cmd, data = pipe.recv()
+            if cmd == 'step':
+                obs, reward, done, info = env.step(data)
+                slot = write(obs)
+                if done:
+                    info['terminal_slot'] = slot
+                    slot = write(env.reset())
+                pipe.send((slot, reward, done, info))
+            elif cmd == 'reset':
+                seed, options = data
+                if seed is not None:
+                    env.seed(seed)
+                pipe.send(write(env.reset(**({'options': options} if options is not None else {}))))
+            elif cmd == 'call':
+                method, args, kwargs = data
+                pipe.send(getattr(env.unwrapped, method)(*args, **kwargs))
+            elif cmd == 'close':
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        if shm is not None:
+            shm.close()
+        pipe.close()
+
+
+class SubprocChromeDinoVecEnv(VectorEnv):
+    """Runs each env of `env_fns` in its own process.
+
+    Use `make_env_fns('ChromeDinoNoBrowser-v0', n)` to build the
+    constructors from a registered id. `ring_size` must be at least 2 so a
+    terminal observation and the following reset observation fit.
+    """
+
+    def __init__(self, env_fns, ring_size=4, context='spawn'):
+        assert ring_size >= 2, 'ring_size must be at least 2'
+        ctx = mp.get_context(context)
+        self.ring_size = ring_size
+        self.pipes, self.processes = [], []
+        for i, env_fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(i, child, env_fn, ring_size), daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+        spaces = [pipe.recv() for pipe in self.pipes]
+        observation_space, action_space = spaces[0]
+        VectorEnv.__init__(self, len(env_fns), observation_space, action_space)
+
+        shape = (self.num_envs, ring_size) + observation_space.shape
+        dtype = np.dtype(observation_space.dtype)
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+        self._ring = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+        for pipe in self.pipes:
+            pipe.send((self._shm.name, shape, dtype.str))
+        self._obs = np.zeros((self.num_envs,) + observation_space.shape, dtype=dtype)
+        self._waiting = False
+
+    def _gather(self, slots):
+        for i, slot in enumerate(slots):
+            self._obs[i] = self._ring[i, slot]
+        return self._obs.copy()
+
+    def reset_async(self, seed=None, return_info=False, options=None):
+        # an int seed gives env i the seed `seed + i`, like gym's vector envs
+        if isinstance(seed, (list, tuple)):
+            seeds = seed
+        else:
+            seeds = [seed + i if seed is not None else None for i in range(self.num_envs)]
+        for pipe, s in zip(self.pipes, seeds):
+            pipe.send(('reset', (s, options)))
+        self._waiting = True
+
+    def reset_wait(self, seed=None, return_info=False, options=None):
+        slots = [pipe.recv() for pipe in self.pipes]
+        self._waiting = False
+        if return_info:
+            return self._gather(slots), [{} for _ in slots]
+        return self._gather(slots)
+
+    def step_async(self, actions):
+        for pipe, action in zip(self.pipes, actions):
+            pipe.send(('step', action))
+        self._waiting = True
+
+    def step_wait(self, **kwargs):
+        results = [pipe.recv() for pipe in self.pipes]
+        self._waiting = False
+        slots, rewards, dones, infos = zip(*results)
+        infos = list(infos)
+        for i, info in enumerate(infos):
+            if 'terminal_slot' in info:
+                info['terminal_observation'] = self._ring[i, info.pop('terminal_slot')].copy()
+        return self._gather(slots), np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool), infos
+
+    def call(self, method, *args, **kwargs):
+        """Call a method of every unwrapped env, e.g. call('get_score')."""
+        for pipe in self.pipes:
+            pipe.send(('call', (method, args, kwargs)))
+        return [pipe.recv() for pipe in self.pipes]
+
+    def close_extras(self, **kwargs):
+        if self._waiting:
+            for pipe in self.pipes:
+                pipe.recv()
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self._ring = None
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Browser recycling and crash recovery for long-running envs.
+
+`SupervisedEnv` replaces the game of a ChromeDinoEnv or ChromeDinoGAEnv at
+reset when it has played `max_episodes` episodes, when its browser uses
+more than `max_rss_mb` or when its mean step latency over the last episode
+exceeds `max_latency`. A browser that dies mid-episode, or does not answer
+a command within `timeout` seconds, ends the episode (done with
+info['game_lost']) and is replaced at the next reset.
+Replacements are launched in the background ahead of time, so a swap only
+costs the reset of a warm game.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import gym
+import urllib3
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from gym_chrome_dino.game import BACKENDS
+from gym_chrome_dino.utils.helpers import kill_process_tree, process_tree_rss
+
+
+def game_pid(game):
+    """Pid of the process tree running the browser of `game`, None if unknown."""
+    if getattr(game, 'process', None) is not None:  # CDPDinoGame
+        return game.process.pid
+    if getattr(game, 'host', None) is None and getattr(game, 'driver', None) is not None:
+        return game.driver.service.process.pid  # chromedriver, the parent of Chrome
+    return None
+
+
+# what a dead browser raises: WebDriverException (CDPError is one) or an HTTP error from chromedriver
+GAME_LOST_ERRORS = (WebDriverException, urllib3.exceptions.HTTPError)
+
+
+def close_game(game, timeout=None):
+    """Close `game`, killing its process tree if closing takes over `timeout` seconds."""
+    pid = game_pid(game)
+    closer = threading.Thread(target=_close, args=(game,), daemon=True)
+    closer.start()
+    closer.join(timeout)
+    if closer.is_alive() and pid is not None:
+        kill_process_tree(pid)
+
+
+def _close(game):
+    try:
+        game.close()
+    except Exception:
+        pass
+
+
+class SupervisedEnv(gym.Wrapper):
+    """Recycles and relaunches the game of the wrapped env, see the module docstring.
+
+    `make_game` launches a replacement game; by default it is launched like
+    the env's own game. With `standby` a replacement is kept launched at all
+    times, otherwise it is launched when needed. Resets and steps that take
+    over `timeout` seconds count as a lost game; they run on a worker thread
+    that is abandoned, and the browser killed, when it hangs.
+    """
+
+    def __init__(self, env, max_episodes=None, max_rss_mb=None, max_latency=None, standby=True, make_game=None,
+                 timeout=30):
+        gym.Wrapper.__init__(self, env)
+        if make_game is None:
+            assert env.unwrapped.game_config is not None, 'Pass make_game for an env made with game='
+            backend, render, accelerate, autoscale, game_kwargs = env.unwrapped.game_config
+            make_game = lambda: BACKENDS[backend](render, accelerate, autoscale, **game_kwargs)
+        self.make_game = make_game
+        self.max_episodes = max_episodes
+        self.max_rss_mb = max_rss_mb
+        self.max_latency = max_latency
+        self.standby = standby
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(1) if timeout is not None else None
+        self.recycles = collections.Counter()  # replacements by reason
+        self.episodes = 0  # episodes played by the current game
+        self.rss_mb = None
+        self.latency = None  # mean step latency of the last episode
+        self.lost = False
+        self._steps = 0
+        self._step_time = 0.
+        self._last_observation = None
+        self._spare = None
+        self._launcher = None
+        if standby:
+            self._launch_spare()
+
+    def _launch_spare(self):
+        def launch():
+            try:
+                self._spare = self.make_game()
+            except Exception:
+                self._spare = None
+        self._launcher = threading.Thread(target=launch, daemon=True)
+        self._launcher.start()
+
+    def _take_spare(self):
+        if self._launcher is not None:
+            self._launcher.join()
+            self._launcher = None
+        game, self._spare = self._spare, None
+        if game is not None:
+            try:
+                game.is_playing()  # the spare may have died while waiting
+            except GAME_LOST_ERRORS:
+                close_game(game, self.timeout)
+                game = None
+        return game if game is not None else self.make_game()
+
+    def _recycle_reason(self):
+        if self.lost:
+            return 'lost'
+        if self.max_episodes is not None and self.episodes >= self.max_episodes:
+            return 'episodes'
+        if self.max_latency is not None and self.latency is not None and self.latency > self.max_latency:
+            return 'latency'
+        if self.max_rss_mb is not None:
+            pid = game_pid(self.env.unwrapped.game)
+            rss = process_tree_rss(pid) if pid is not None else None
+            self.rss_mb = rss / 2 ** 20 if rss is not None else None
+            if self.rss_mb is not None and self.rss_mb > self.max_rss_mb:
+                return 'rss'
+        return None
+
+    def recycle(self, reason='manual'):
+        """Swap in a fresh game now; the old one is closed in the background."""
+        env = self.env.unwrapped
+        old, env.game = env.game, self._take_spare()
+        env.pooled = False  # the old game is not given back to the pool
+        threading.Thread(target=close_game, args=(old, self.timeout), daemon=True).start()
+        self.recycles[reason] += 1
+        self.episodes = 0
+        self.latency = None
+        self.lost = False
+        if self.standby:
+            self._launch_spare()
+
+    def _call(self, fn, *args, **kwargs):
+        if self._executor is None:
+            return fn(*args, **kwargs)
+        future = self._executor.submit(fn, *args, **kwargs)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # the hung call keeps the worker until the browser is killed at recycling
+            self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(1)
+            raise TimeoutException('No answer from the game in {} s'.format(self.timeout))
+
+    def reset(self, **kwargs):
+        reason = self._recycle_reason()
+        if reason is not None:
+            self.recycle(reason)
+        try:
+            observation = self._call(self.env.reset, **kwargs)
+        except GAME_LOST_ERRORS:
+            self.recycle('lost')
+            observation = self._call(self.env.reset, **kwargs)
+        self.episodes += 1
+        self._steps = 0
+        self._step_time = 0.
+        self._last_observation = observation
+        return observation
+
+    def step(self, action):
+        start = time.perf_counter()
+        try:
+            observation, reward, done, info = self._call(self.env.step, action)
+        except GAME_LOST_ERRORS as e:
+            self.lost = True
+            if self._last_observation is None:  # no episode to end before the first reset
+                raise
+            return self._last_observation, 0., True, {'game_lost': '{}: {}'.format(type(e).__name__, e)}
+        self._steps += 1
+        self._step_time += time.perf_counter() - start
+        if done:
+            self.latency = self._step_time / self._steps
+        self._last_observation = observation
+        return observation, reward, done, info
+
+    def close(self):
+        if self._launcher is not None:
+            self._launcher.join()
+        if self._spare is not None:
+            close_game(self._spare, self.timeout)
+            self._spare = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.env.close()
@@ -4,4 +4,14 @@
 # Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
-from gym_chrome_dino.game.dino_game import DinoGame
\ No newline at end of file
+from gym_chrome_dino.game.cdp import CDPDinoGame
+from gym_chrome_dino.game.dino_game import DinoGame
+from gym_chrome_dino.game.dino_host import DinoHost, HostedDinoGame
+from gym_chrome_dino.game.async_game import AsyncDinoGame
+from gym_chrome_dino.game.dino_sim import DinoSim
+
+BACKENDS = {
+    'chrome': DinoGame,
+    'cdp': CDPDinoGame,
+    'sim': DinoSim,
+}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""asyncio front end for the blocking game backends.
+
+Every wrapped object gets its own single worker thread, so its calls stay
+in order (a WebDriver session is not thread safe) while calls on different
+games overlap. The browser round trips release the GIL, so a gather over N
+games takes about as long as the slowest one.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncProxy():
+    """Turns every method of `target` into a coroutine run on its own thread."""
+
+    def __init__(self, target, executor=None):
+        self._target = target
+        self._executor = executor or ThreadPoolExecutor(1)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+        method.__name__ = name
+        return method
+
+    async def close(self):
+        try:
+            await self._run(self._target.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+class AsyncDinoGame(AsyncProxy):
+    """`await game.step(key, frame)` on any DinoGame backend.
+
+    Wrap an existing game, or build one off the event loop thread with
+    `await AsyncDinoGame.create(DinoGame, ...)`.
+    """
+
+    @classmethod
+    async def create(cls, game_cls, *args, **kwargs):
+        executor = ThreadPoolExecutor(1)
+        loop = asyncio.get_running_loop()
+        game = await loop.run_in_executor(executor, functools.partial(game_cls, *args, **kwargs))
+        return cls(game, executor)
+
+    @property
+    def game(self):
+        return self._target
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A DinoGame backend talking to Chrome over the DevTools Protocol.
+
+Instead of one HTTP request to chromedriver per command, `CDPDinoGame`
+keeps a single websocket to the page target open. Commands are tagged with
+ids and a reader thread matches the responses, so several commands can be
+in flight at once: `step` sends the key events (`Input.dispatchKeyEvent`)
+and the state read (`Runtime.evaluate`) back to back and waits once.
+
+Chrome is launched directly with --remote-debugging-port, so chromedriver
+is not needed. The websocket client only uses the standard library.
+"""
+
+import base64
+import itertools
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from selenium.common.exceptions import WebDriverException
+
+from gym_chrome_dino.game import scripts
+from gym_chrome_dino.game.dino_game import CAPTURE_MODES, KEYCODES, DinoGame, get_dino_url
+from gym_chrome_dino.utils.profiling import PROFILER
+
+CHROME_BINARIES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+
+KEY_NAMES = {
+    32: (' ', 'Space'),
+    38: ('ArrowUp', 'ArrowUp'),
+    40: ('ArrowDown', 'ArrowDown'),
+}
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class CDPError(WebDriverException):
+    pass
+
+
+def _recv_exactly(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError('websocket closed')
+        buf += chunk
+    return bytes(buf)
+
+
+def _mask(payload, key):
+    n = len(payload)
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(n, 'big')
+
+
+def send_frame(sock, opcode, payload, mask=True):
+    header = bytearray([0x80 | opcode])
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('>H', n)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('>Q', n)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _mask(payload, key)
+    sock.sendall(bytes(header) + payload)
+
+
+def recv_frame(sock):
+    """Read one frame, returns (fin, opcode, payload)."""
+    b0, b1 = _recv_exactly(sock, 2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack('>H', _recv_exactly(sock, 2))[0]
+    elif n == 127:
+        n = struct.unpack('>Q', _recv_exactly(sock, 8))[0]
+    key = _recv_exactly(sock, 4) if b1 & 0x80 else None
+    payload = _recv_exactly(sock, n)
+    if key is not None:
+        payload = _mask(payload, key)
+    return bool(b0 & 0x80), b0 & 0x0F, payload
+
+
+def recv_message(sock):
+    """Read one (possibly fragmented) message, answering pings on the way."""
+    message, message_opcode = b'', None
+    while True:
+        fin, opcode, payload = recv_frame(sock)
+        if opcode == OP_PING:
+            send_frame(sock, OP_PONG, payload)
+            continue
+        if opcode == OP_PONG:
+            continue
+        if opcode == OP_CLOSE:
+            raise ConnectionError('websocket closed')
+        if opcode != OP_CONTINUATION:
+            message_opcode = opcode
+        message += payload
+        if fin:
+            return message_opcode, message
+
+
+class WebSocket():
+    """A minimal RFC 6455 client, enough for the DevTools endpoint."""
+
+    def __init__(self, url, timeout=10):
+        u = urlparse(url)
+        self.sock = socket.create_connection((u.hostname, u.port or 80), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = u.path + ('?' + u.query if u.query else '')
+        request = (
+            'GET {} HTTP/1.1\r\nHost: {}:{}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            'Sec-WebSocket-Key: {}\r\nSec-WebSocket-Version: 13\r\n\r\n'
+        ).format(path, u.hostname, u.port or 80, key)
+        self.sock.sendall(request.encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = self.sock.recv(1024)
+            if not chunk:
+                raise ConnectionError('websocket handshake failed')
+            response += chunk
+        status = response.split(b'\r\n', 1)[0]
+        if b' 101 ' not in status + b' ':
+            raise ConnectionError('websocket handshake failed: ' + status.decode(errors='replace'))
+        self.sock.settimeout(None)
+        self._send_lock = threading.Lock()
+
+    def send(self, text):
+        with self._send_lock:
+            send_frame(self.sock, OP_TEXT, text.encode())
+
+    def recv(self):
+        return recv_message(self.sock)[1].decode()
+
+    def close(self):
+        try:
+            with self._send_lock:
+                send_frame(self.sock, OP_CLOSE, b'')
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class PendingCommand():
+    def __init__(self, method):
+        self.method = method
+        self._event = threading.Event()
+        self._message = None
+
+    def _resolve(self, message):
+        self._message = message
+        self._event.set()
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise CDPError('Timed out waiting for ' + self.method)
+        message = self._message
+        if 'error' in message:
+            raise CDPError('{}: {}'.format(self.method, message['error'].get('message')))
+        return message.get('result', {})
+
+
+class CDPConnection():
+    """Pipelined DevTools Protocol session over one websocket.
+
+    `send` returns a PendingCommand right away; `call` waits for the
+    result. Events are passed to the callbacks registered with `on`.
+    """
+
+    def __init__(self, ws_url, timeout=30):
+        self.ws = WebSocket(ws_url)
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._listeners = {}
+        self.closed = False
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        try:
+            while True:
+                message = json.loads(self.ws.recv())
+                if 'id' in message:
+                    with self._lock:
+                        pending = self._pending.pop(message['id'], None)
+                    if pending is not None:
+                        pending._resolve(message)
+                else:
+                    for callback in self._listeners.get(message.get('method'), []):
+                        callback(message.get('params', {}))
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for p in pending.values():
+                p._resolve({'error': {'message': 'connection closed'}})
+
+    def send(self, method, params=None):
+        if self.closed:
+            raise CDPError('{}: connection closed'.format(method))
+        command_id = next(self._ids)
+        pending = PendingCommand(method)
+        with self._lock:
+            self._pending[command_id] = pending
+        self.ws.send(json.dumps({'id': command_id, 'method': method, 'params': params or {}}))
+        return pending
+
+    def call(self, method, params=None):
+        return self.send(method, params).result(self.timeout)
+
+    def on(self, method, callback):
+        self._listeners.setdefault(method, []).append(callback)
+
+    def off(self, method, callback):
+        self._listeners.get(method, []).remove(callback)
+
+    def close(self):
+        self.ws.close()
+        self._reader.join(1)
+
+
+def find_chrome():
+    path = os.environ.get('CHROME_PATH')
+    if path:
+        return path
+    for name in CHROME_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise CDPError('Chrome not found, set CHROME_PATH')
+
+
+def launch_chrome_cdp(render=False, arguments=(), timeout=30):
+    """Start Chrome with remote debugging, returns (process, user_data_dir, port)."""
+    user_data_dir = tempfile.mkdtemp(prefix='gym-chrome-dino-')
+    command = [
+        find_chrome(),
+        '--remote-debugging-port=0',
+        '--remote-allow-origins=*',
+        '--user-data-dir=' + user_data_dir,
+        '--no-first-run',
+        '--no-default-browser-check',
+        '--disable-infobars',
+        '--mute-audio',
+        '--no-sandbox',
+        '--window-size=800,600',
+    ] + list(arguments)
+    if not render:
+        command.append('--headless')
+    command.append('about:blank')
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    port_file = os.path.join(user_data_dir, 'DevToolsActivePort')
+    deadline = time.time() + timeout
+    while True:
+        if os.path.exists(port_file):
+            with open(port_file) as f:
+                lines = f.read().split()
+            if lines:
+                return process, user_data_dir, int(lines[0])
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+            raise CDPError('Chrome did not start a DevTools endpoint')
+        time.sleep(.05)
+
+
+def page_ws_url(port, host='127.0.0.1'):
+    with urlopen('http://{}:{}/json/list'.format(host, port)) as response:
+        targets = json.loads(response.read().decode())
+    for target in targets:
+        if target.get('type') == 'page':
+            return target['webSocketDebuggerUrl']
+    raise CDPError('No page target found')
+
+
+class CDPDinoGame(DinoGame):
+    """DinoGame over the DevTools Protocol.
+
+    Pass `ws_url` to attach to an already running page target (e.g. the
+    MockCDPServer in gym_chrome_dino.game.mock_cdp) instead of launching
+    Chrome.
+
+    With capture='stream' frames are pushed by the browser through
+    `Page.startScreencast` (see gym_chrome_dino.game.screencast) and
+    `step` takes the newest one instead of capturing the canvas. It waits up
+    to `stream_wait` seconds for a frame sent after the step began; since
+    Chrome sends no frames for a scene that does not change, the frame may
+    still be older, which `stale_frame` reports.
+    """
+    capture_modes = CAPTURE_MODES + ('stream',)
+
+    def __init__(self, render=False, accelerate=False, autoscale=False, n_obstacles=3, capture='png',
+                 frame_size=(160, 80), crop=None, lockstep=False, frames_per_step=1, ws_url=None, timeout=30,
+                 stream_buffer=8, stream_format='png', stream_wait=.05):
+        self._configure(n_obstacles, capture, frame_size, crop, lockstep, frames_per_step)
+        self.process = self.user_data_dir = self.cdp = self.stream = None
+        self.stream_wait = stream_wait
+        self.stale_frame = False
+        try:
+            if ws_url is None:
+                self.process, self.user_data_dir, port = launch_chrome_cdp(render, timeout=timeout)
+                ws_url = page_ws_url(port)
+            self.cdp = CDPConnection(ws_url, timeout=timeout)
+            self.cdp.call('Page.navigate', {'url': get_dino_url()})
+            deadline = time.time() + timeout
+            while not self.execute('return !!(window.Runner && Runner.instance_);'):
+                if time.time() > deadline:
+                    raise CDPError('Timed out waiting for the game page')
+                time.sleep(.05)
+            self._setup(accelerate, autoscale)
+            if self.capture == 'stream':
+                from gym_chrome_dino.game.screencast import FrameStream
+                rect = self.execute(scripts.CANVAS_RECT)
+                self.stream = FrameStream(self.cdp, clip=rect[:4], size=rect[4:], buffer_size=stream_buffer,
+                                          format=stream_format)
+                self.stream.start()
+        except Exception:
+            self.close()
+            raise
+
+    def _evaluate_params(self, script, args):
+        expression = '(function(){%s}).apply(null, %s)' % (script, json.dumps(list(args)))
+        return {'expression': expression, 'returnByValue': True}
+
+    def _evaluate_result(self, result):
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CDPError(details.get('exception', {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+
+    def execute(self, script, *args):
+        with PROFILER.stage('game.execute'):
+            return self._evaluate_result(self.cdp.call('Runtime.evaluate', self._evaluate_params(script, args)))
+
+    def execute_async(self, script, *args):
+        """Send a script without waiting; call .result() on the returned object."""
+        pending = self.cdp.send('Runtime.evaluate', self._evaluate_params(script, args))
+        game = self
+
+        class Result():
+            def result(self, timeout=None):
+                return game._evaluate_result(pending.result(timeout or game.cdp.timeout))
+        return Result()
+
+    def execute_async_script(self, script, *args):
+        with PROFILER.stage('game.execute'):
+            expression = 'new Promise(function(resolve){(function(){%s}).apply(null, %s.concat([resolve]))})' % (
+                script, json.dumps(list(args)))
+            return self._evaluate_result(self.cdp.call('Runtime.evaluate', {
+                'expression': expression, 'returnByValue': True, 'awaitPromise': True}))
+
+    def _send_key(self, keycode):
+        key, code = KEY_NAMES[keycode]
+        pending = []
+        for event in ('rawKeyDown', 'keyUp'):
+            pending.append(self.cdp.send('Input.dispatchKeyEvent', {
+                'type': event, 'key': key, 'code': code,
+                'windowsVirtualKeyCode': keycode, 'nativeVirtualKeyCode': keycode,
+            }))
+        return pending
+
+    def press(self, key):
+        for pending in self._send_key(KEYCODES[key]):
+            pending.result(self.cdp.timeout)
+
+    def get_frame(self):
+        if self.capture == 'stream':
+            return self.stream.latest(self.cdp.timeout).image
+        return DinoGame.get_frame(self)
+
+    def step(self, key=None, frame=False, repeat=1):
+        """Like DinoGame.step, with real key events in real time.
+
+        The key events and the step script are sent back to back and only
+        the reply of the script is awaited: the page session runs commands
+        in order, so the state is read after the key was handled. In
+        lock-step mode the key is pressed by the step script, before the
+        frames advance.
+        """
+        streamed = frame and self.capture == 'stream'
+        before = self.stream.newest_id if streamed else None
+        if repeat > 1 or self.lockstep:
+            state, image = DinoGame.step(self, key, frame and not streamed, repeat)
+        else:
+            keys = self._send_key(KEYCODES[key]) if key else []
+            values = self.execute(scripts.STEP, *self._step_args(None, frame and not streamed))
+            for p in keys:
+                p.result(self.cdp.timeout)  # answered before the script, raises if a key was rejected
+            state, image = self._step_result(values, frame and not streamed)
+        if streamed:
+            with PROFILER.stage('game.stream_frame'):
+                image = self._stream_frame(before)
+        return state, image
+
+    def _stream_frame(self, before):
+        try:
+            self.stream.wait(before, self.stream_wait)
+        except CDPError:
+            pass  # nothing changed on screen, or the frame is late
+        image = self.get_frame()
+        self.stale_frame = self.stream.last.frame_id <= before
+        return image
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+        if self.cdp is not None and not self.cdp.closed:
+            if self.process is not None:
+                try:
+                    self.cdp.send('Browser.close')
+                except CDPError:
+                    pass
+            self.cdp.close()
+        if self.process is not None:
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
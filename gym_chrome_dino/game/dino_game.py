@@ -4,114 +4,293 @@
 # Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
+import base64
+import io
+import numpy as np
 import os
+from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import WebDriverException
 
-from gym_chrome_dino.utils.helpers import download_chromedriver
+from gym_chrome_dino.game import scripts
+from gym_chrome_dino.game.policy import pack_policy
+from gym_chrome_dino.game.state import unpack_state
+from gym_chrome_dino.utils.helpers import download_chromedriver, rgba2rgb, rgba2rgb_array
+from gym_chrome_dino.utils.profiling import PROFILER
+
+CAPTURE_MODES = ('png', 'rgba', 'gray')
+
+FPS = 60
+
+KEYCODES = {
+    'SPACE': 32,
+    'UP': 38,
+    'DOWN': 40,
+}
+
+def launch_chrome(render=False, arguments=()):
+    if not os.path.exists('chromedriver') and not os.path.exists('chromedriver.exe'):
+        download_chromedriver()
+    chromedriver_path = './chromedriver'
+    options = Options()
+    options.add_argument('--disable-infobars')
+    options.add_argument('--mute-audio')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--window-size=800,600')
+    if not render:
+        options.add_argument('--headless')
+    for argument in arguments:
+        options.add_argument(argument)
+    return webdriver.Chrome(executable_path=chromedriver_path, options=options)
+
+def get_dino_url():
+    # Get Dino URL to render according to ENV Variable DINO_URL
+    return str(os.environ.get("DINO_URL", "chrome://dino"))
 
 class DinoGame():
-    def __init__(self, render=False, accelerate=False, autoscale=False):
-        if not os.path.exists('chromedriver') and not os.path.exists('chromedriver.exe'):
-            download_chromedriver()
-        chromedriver_path = './chromedriver'
-        options = Options()
-        options.add_argument('--disable-infobars')
-        options.add_argument('--mute-audio')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--window-size=800,600')
-        if not render:
-            options.add_argument('--headless')
-        self.driver = webdriver.Chrome(executable_path=chromedriver_path, options=options)
-        
-        # Get Dino URL to render according to ENV Variable DINO_PATH
+    capture_modes = CAPTURE_MODES
 
-        dino_url = str(os.environ.get("DINO_URL", "chrome://dino"))
+    def __init__(self, render=False, accelerate=False, autoscale=False, n_obstacles=3, capture='png',
+                 frame_size=(160, 80), crop=None, lockstep=False, frames_per_step=1):
+        self._configure(n_obstacles, capture, frame_size, crop, lockstep, frames_per_step)
+        self.driver = launch_chrome(render)
 
         try:
-            self.driver.get(dino_url)
+            self.driver.get(get_dino_url())
         except WebDriverException:
             pass
 
+        self._setup(accelerate, autoscale)
+
+    def _configure(self, n_obstacles, capture, frame_size, crop, lockstep, frames_per_step):
+        assert capture in self.capture_modes, 'Unsupported capture mode: ' + str(capture)
+        # in lock-step mode the game only advances frames_per_step frames of 1/FPS s per step
+        self.lockstep = lockstep
+        self.frames_per_step = frames_per_step
+        self.n_obstacles = n_obstacles
+        self.capture = capture
+        self.frame_size = tuple(frame_size)  # (width, height) of the 'gray' frame
+        self.crop = list(crop) if crop is not None else None  # (x, y, width, height) on the canvas
+        self._scratch = None
+
+    def _setup(self, accelerate, autoscale):
         self.defaults = self.get_parameters()  # default parameters
         if not accelerate:
             self.set_parameter('config.ACCELERATION', 0)
         if not autoscale:
-            self.driver.execute_script('Runner.instance_.setArcadeModeContainerScale = function(){};')
-        self.press_space()
+            self.execute('Runner.instance_.setArcadeModeContainerScale = function(){};')
+        if self.lockstep:
+            # the clock goes in first, so the start-up jump and the intro run on it too
+            self.execute(scripts.LOCKSTEP_INSTALL, 1000 / FPS)
+            self.execute(scripts.LOCKSTEP_START)
+        else:
+            self.press_space()
+
+    def execute(self, script, *args):
+        with PROFILER.stage('game.execute'):
+            return self.driver.execute_script(script, *args)
         
     def get_parameters(self):
         params = {}
-        params['config.ACCELERATION'] = self.driver.execute_script('return Runner.config.ACCELERATION;')
+        params['config.ACCELERATION'] = self.execute('return Runner.config.ACCELERATION;')
         return params
     
     def is_crashed(self):
-        return self.driver.execute_script('return Runner.instance_.crashed;')
+        return self.execute('return Runner.instance_.crashed;')
     
     def is_inverted(self):
-        return self.driver.execute_script('return Runner.instance_.inverted;')
+        return self.execute('return Runner.instance_.inverted;')
     
     def is_paused(self):
-        return self.driver.execute_script('return Runner.instance_.paused;')
+        return self.execute('return Runner.instance_.paused;')
     
     def is_playing(self):
-        return self.driver.execute_script('return Runner.instance_.playing;')
+        return self.execute('return Runner.instance_.playing;')
     
+    def press(self, key):
+        return self.execute(scripts.PRESS_KEY, KEYCODES[key])
+
     def press_space(self):
-        return self.driver.find_element_by_tag_name('body').send_keys(Keys.SPACE)
+        return self.press('SPACE')
     
     def press_up(self):
-        return self.driver.find_element_by_tag_name('body').send_keys(Keys.UP)
+        return self.press('UP')
     
     def press_down(self):
-        return self.driver.find_element_by_tag_name('body').send_keys(Keys.DOWN)
+        return self.press('DOWN')
     
     def pause(self):
-        return self.driver.execute_script('Runner.instance_.stop();')
+        return self.execute('Runner.instance_.stop();')
     
     def resume(self):
-        return self.driver.execute_script('Runner.instance_.play();')
+        return self.execute('Runner.instance_.play();')
     
     def restart(self):
-        return self.driver.execute_script('Runner.instance_.restart();')
+        if self.lockstep:
+            return self.execute(scripts.LOCKSTEP_RESTART)
+        return self.execute('Runner.instance_.restart();')
+
+    def advance(self, frames=1):
+        # only has an effect in lock-step mode
+        return self.execute(scripts.ADVANCE, frames)
+
+    def seed(self, seed=None):
+        # the game draws obstacles from Math.random, which is replaced by a seeded generator
+        if seed is not None:
+            self.execute(scripts.SEED_RANDOM, seed % 2 ** 32)
+        return seed
     
+    def evaluate(self, policies, max_steps=10000, seed=None, batch_size=16):
+        """Run one episode per policy inside the page, returns (scores, steps).
+
+        Policies are lists of (weights, bias) layers, see
+        gym_chrome_dino.game.policy. With `seed`, every episode sees the same
+        obstacles. Policies are sent `batch_size` at a time to stay within
+        the script timeout.
+        """
+        assert self.lockstep, 'evaluate needs lockstep=True'
+        seed = seed % 2 ** 32 if seed is not None else None
+        results = []
+        for i in range(0, len(policies), batch_size):
+            batch = [pack_policy(p) for p in policies[i:i + batch_size]]
+            results += self.execute(scripts.EVALUATE, batch, max_steps, self.frames_per_step, seed)
+        results = np.array(results, dtype=np.int64).reshape(-1, 2)
+        return results[:, 0], results[:, 1]
+
+    def save_state(self):
+        """Snapshot of the running game as a JSON-compatible dict."""
+        return self.execute(scripts.SAVE_STATE)
+
+    def load_state(self, snapshot):
+        # a snapshot can be loaded into any started game, also of another browser
+        return self.execute(scripts.LOAD_STATE, snapshot)
+
     def close(self):
-        self.driver.close()
+        self.driver.quit()  # close() only closes the window, chromedriver and Chrome keep running
     
     def get_score(self):
-        digits = self.driver.execute_script('return Runner.instance_.distanceMeter.digits;');
+        digits = self.execute('return Runner.instance_.distanceMeter.digits;');
         return int(''.join(digits))
 
     def get_dino_x_position(self):
-        return self.driver.execute_script('return Runner.instance_.tRex.xPos;');
+        return self.execute('return Runner.instance_.tRex.xPos;');
     
     def get_dino_y_position(self):
-        return self.driver.execute_script('return Runner.instance_.tRex.yPos;');
+        return self.execute('return Runner.instance_.tRex.yPos;');
 
     def get_nearest_obstacle_width(self):
-        return self.driver.execute_script('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].typeConfig.width : 0');
+        return self.execute('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].typeConfig.width : 0');
     
     def get_nearest_obstacle_height(self):
-        return self.driver.execute_script('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].typeConfig.height : 0');
+        return self.execute('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].typeConfig.height : 0');
 
     def get_nearest_obstacle_x_distance(self):
-        t_nearest_obstacle = self.driver.execute_script('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].xPos : 600');
+        t_nearest_obstacle = self.execute('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].xPos : 600');
         return t_nearest_obstacle - self.get_dino_x_position();
     
     def get_nearest_obstacle_y_distance(self):
-        t_nearest_obstacle = self.driver.execute_script('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].yPos : 150');
+        t_nearest_obstacle = self.execute('return Runner.instance_.horizon.obstacles.length ? Runner.instance_.horizon.obstacles[0].yPos : 150');
         return t_nearest_obstacle - self.get_dino_y_position();
 
     def get_speed(self):
-        return self.driver.execute_script('return Runner.instance_.currentSpeed;')
+        return self.execute('return Runner.instance_.currentSpeed;')
+
+    def get_state(self):
+        return self._unpack(self.execute(scripts.GET_STATE, self.n_obstacles))
+
+    def _unpack(self, values):
+        return unpack_state(values, self.n_obstacles)
 
     def get_canvas(self):
-        return self.driver.execute_script('return document.getElementsByClassName("runner-canvas")[0].toDataURL().substring(22);')
+        return self.execute(scripts.GET_CANVAS)
+
+    def get_pixels(self):
+        return self.execute(scripts.GET_PIXELS)
+
+    def get_gray(self):
+        width, height = self.frame_size
+        return self.execute(scripts.GET_GRAY, width, height, self.crop)
+
+    def get_frame(self):
+        if self.capture == 'rgba':
+            return self._decode_pixels(self.get_pixels())
+        if self.capture == 'gray':
+            return self._decode_gray(self.get_gray())
+        return self._decode_canvas(self.get_canvas())
+
+    def step(self, key=None, frame=False, repeat=1):
+        """Press `key` (if any) and read back the state in one round trip.
+
+        Returns a (state, frame) tuple, where frame is the RGB canvas when
+        `frame` is set and None otherwise. With `repeat` > 1 the press is
+        repeated for that many steps (animation frames in real time) or until
+        a crash, and the frame is the max over the last two; `self.repeats`
+        holds the number of steps taken.
+        """
+        args = self._step_args(key, frame, repeat)
+        if repeat > 1 and not self.lockstep:
+            return self._step_result(self.execute_async_script(scripts.STEP_ASYNC, *args), frame)
+        return self._step_result(self.execute(scripts.STEP, *args), frame)
+
+    def execute_async_script(self, script, *args):
+        """Run a script that passes its result to the callback given as its last argument."""
+        with PROFILER.stage('game.execute'):
+            return self.driver.execute_async_script(script, *args)
+
+    def _step_args(self, key, frame, repeat=1):
+        keycode = KEYCODES[key] if key else 0
+        capture = self.capture if frame else None
+        width, height = self.frame_size
+        frames = self.frames_per_step if self.lockstep else 0
+        return [keycode, self.n_obstacles, capture, width, height, self.crop, frames, repeat]
+
+    def _step_result(self, result, frame):
+        values, data, previous, self.repeats = result
+        state = self._unpack(values)
+        if not frame:
+            return state, None
+        image = self._decode_frame(data)
+        if previous is not None:
+            # max-pool over the last two frames, in place in the newest one
+            with PROFILER.stage('game.max_pool'):
+                np.maximum(image, self._decode_frame(previous), out=image)
+        return state, image
+
+    def _decode_frame(self, data):
+        if self.capture == 'rgba':
+            return self._decode_pixels(data)
+        if self.capture == 'gray':
+            return self._decode_gray(data)
+        return self._decode_canvas(data)
+
+    def _decode_canvas(self, s):
+        with PROFILER.stage('game.b64decode'):
+            b = io.BytesIO(base64.b64decode(s))
+        with PROFILER.stage('game.png_decode'):
+            i = Image.open(b)
+            i.load()
+        with PROFILER.stage('game.rgba2rgb'):
+            i = rgba2rgb(i)
+            return np.array(i)
+
+    def _decode_pixels(self, data):
+        # raw RGBA bytes are viewed without copying and composited in a reused scratch buffer
+        width, height, s = data
+        with PROFILER.stage('game.b64decode'):
+            rgba = np.frombuffer(base64.b64decode(s), dtype=np.uint8).reshape(height, width, 4)
+        if self._scratch is None or self._scratch.shape[:2] != (height, width):
+            self._scratch = np.empty((height, width, 3), dtype=np.uint16)
+        with PROFILER.stage('game.rgba2rgb'):
+            return rgba2rgb_array(rgba, scratch=self._scratch)
+
+    def _decode_gray(self, s):
+        width, height = self.frame_size
+        with PROFILER.stage('game.b64decode'):
+            return np.frombuffer(base64.b64decode(s), dtype=np.uint8).reshape(height, width, 1).copy()
     
     def set_parameter(self, key, value):
-        self.driver.execute_script('Runner.{} = {};'.format(key, value))
+        self.execute('Runner.{} = {};'.format(key, value))
     
     def restore_parameter(self, key):
-        self.set_parameter(self, key, self.defaults[key])
\ No newline at end of file
+        self.set_parameter(key, self.defaults[key])
\ No newline at end of file
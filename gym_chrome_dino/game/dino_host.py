@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Many game instances hosted as iframes of a single Chrome.
+
+`DinoHost` launches one browser, loads the game page and replaces it with
+`num_games` same-origin iframes of the same page, each running its own
+Runner. `host.games` holds one `DinoGame`-like handle per iframe, and the
+batched `get_states`/`step` methods cover every instance in one
+execute_script call. Background throttling is disabled so that instances
+in iframes keep running at full frame rate.
+
+Since the iframes must be same-origin with the host page, DINO_URL has to
+point to a served copy of the game; chrome://dino cannot be framed.
+"""
+
+import time
+
+from gym_chrome_dino.game import scripts
+from gym_chrome_dino.game.dino_game import DinoGame, get_dino_url, launch_chrome
+from gym_chrome_dino.utils.profiling import PROFILER
+
+HOST_ARGUMENTS = [
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+]
+
+
+class HostedDinoGame(DinoGame):
+    """A DinoGame running in one iframe of a DinoHost."""
+
+    def __init__(self, host, index, accelerate=False, autoscale=False, n_obstacles=3, capture='png',
+                 frame_size=(160, 80), crop=None, lockstep=False, frames_per_step=1):
+        self._configure(n_obstacles, capture, frame_size, crop, lockstep, frames_per_step)
+        self.host = host
+        self.index = index
+        self.driver = host.driver
+        self._setup(accelerate, autoscale)
+
+    def execute(self, script, *args):
+        with PROFILER.stage('game.execute'):
+            return self.driver.execute_script(scripts.HOST_EXECUTE, self.index, script, list(args))
+
+    def execute_async_script(self, script, *args):
+        with PROFILER.stage('game.execute'):
+            return self.driver.execute_async_script(scripts.HOST_EXECUTE_ASYNC, self.index, script, list(args))
+
+    def close(self):
+        # the browser belongs to the host
+        pass
+
+
+class DinoHost():
+    def __init__(self, num_games, render=False, accelerate=False, autoscale=False, timeout=30, **game_kwargs):
+        dino_url = get_dino_url()
+        assert not dino_url.startswith('chrome://'), 'DinoHost needs DINO_URL to point to a served game page'
+        self.driver = launch_chrome(render, HOST_ARGUMENTS)
+        self.driver.get(dino_url)
+        self.driver.execute_script(scripts.HOST_SETUP, num_games)
+        deadline = time.time() + timeout
+        while self.driver.execute_script(scripts.HOST_READY) < num_games:
+            if time.time() > deadline:
+                self.driver.quit()
+                raise RuntimeError('Timed out waiting for {} game instances'.format(num_games))
+            time.sleep(.1)
+        self.games = [HostedDinoGame(self, i, accelerate, autoscale, **game_kwargs) for i in range(num_games)]
+
+    def __len__(self):
+        return len(self.games)
+
+    def execute_all(self, script, args=None, indices=None):
+        """Run `script` in several instances (all by default) in one call."""
+        if indices is None:
+            indices = list(range(len(self.games)))
+        if args is None:
+            args = [[] for _ in indices]
+        return self.driver.execute_script(scripts.HOST_EXECUTE_ALL, script, list(indices), list(args))
+
+    def get_states(self):
+        values = self.execute_all(scripts.GET_STATE, [[g.n_obstacles] for g in self.games])
+        return [g._unpack(v) for g, v in zip(self.games, values)]
+
+    def step(self, keys, frame=False):
+        """Press one key (or None) per instance and return their (state, frame) tuples."""
+        args = [g._step_args(key, frame) for g, key in zip(self.games, keys)]
+        results = self.execute_all(scripts.STEP, args)
+        return [g._step_result(r, frame) for g, r in zip(self.games, results)]
+
+    def close(self):
+        self.driver.quit()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A headless pure Python port of the T-Rex Runner game logic.
+
+`DinoSim` follows the update loop of the Runner, Trex, Horizon, Obstacle and
+DistanceMeter classes of the game page, with the browser clock replaced by
+a fixed frame time. It exposes the same interface as `DinoGame`, so the envs
+can run on it without Chrome or chromedriver. Sounds, clouds, blinking and
+sprite animation are left out since they do not affect the game state.
+"""
+
+import math
+import random
+
+import cv2
+import numpy as np
+
+from gym_chrome_dino.game.policy import act, check_policy
+from gym_chrome_dino.game.state import EMPTY_OBSTACLE, OBSTACLE_TYPES, ga_observation, unpack_state
+
+FPS = 60
+FRAME_MS = 1000 / FPS
+WIDTH = 600
+HEIGHT = 150
+BOTTOM_PAD = 10
+
+CONFIG = {
+    'ACCELERATION': 0.001,
+    'CLEAR_TIME': 3000,
+    'GAMEOVER_CLEAR_TIME': 750,
+    'GAP_COEFFICIENT': 0.6,
+    'INVERT_DISTANCE': 700,
+    'INVERT_FADE_DURATION': 12000,
+    'MAX_OBSTACLE_DUPLICATION': 2,
+    'MAX_SPEED': 13,
+    'SPEED': 6,
+}
+
+# Trex.config
+TREX_DROP_VELOCITY = -5
+TREX_GRAVITY = 0.6
+TREX_HEIGHT = 47
+TREX_INITIAL_JUMP_VELOCITY = -10
+TREX_INTRO_DURATION = 1500
+TREX_MAX_JUMP_HEIGHT = 30
+TREX_MIN_JUMP_HEIGHT = 30
+TREX_SPEED_DROP_COEFFICIENT = 3
+TREX_START_X_POS = 50
+TREX_WIDTH = 44
+TREX_GROUND_Y_POS = HEIGHT - TREX_HEIGHT - BOTTOM_PAD
+
+# Trex.collisionBoxes, as (x, y, width, height)
+TREX_BOXES_DUCKING = [(1, 18, 55, 25)]
+TREX_BOXES_RUNNING = [
+    (22, 0, 17, 16), (1, 18, 30, 9), (10, 35, 14, 8),
+    (1, 24, 29, 5), (5, 30, 21, 4), (9, 34, 15, 4),
+]
+
+# Obstacle.types, in the order of OBSTACLE_TYPES
+OBSTACLE_CONFIGS = [
+    {
+        'type': 'CACTUS_SMALL', 'width': 17, 'height': 35, 'yPos': [105],
+        'multipleSpeed': 4, 'minGap': 120, 'minSpeed': 0, 'speedOffset': 0,
+        'collisionBoxes': [(0, 7, 5, 27), (4, 0, 6, 34), (10, 4, 7, 14)],
+    },
+    {
+        'type': 'CACTUS_LARGE', 'width': 25, 'height': 50, 'yPos': [90],
+        'multipleSpeed': 7, 'minGap': 120, 'minSpeed': 0, 'speedOffset': 0,
+        'collisionBoxes': [(0, 12, 7, 38), (8, 0, 7, 49), (13, 10, 10, 38)],
+    },
+    {
+        'type': 'PTERODACTYL', 'width': 46, 'height': 40, 'yPos': [100, 75, 50],
+        'multipleSpeed': 999, 'minGap': 150, 'minSpeed': 8.5, 'speedOffset': .8,
+        'collisionBoxes': [(15, 15, 16, 5), (18, 21, 24, 6), (2, 14, 4, 3), (6, 10, 4, 7), (10, 8, 6, 9)],
+    },
+]
+assert [c['type'] for c in OBSTACLE_CONFIGS] == OBSTACLE_TYPES
+
+MAX_GAP_COEFFICIENT = 1.5
+MAX_OBSTACLE_LENGTH = 3
+
+DISTANCE_COEFFICIENT = 0.025
+MAX_SCORE = 99999
+
+KEY_JUMP = (32, 38)
+KEY_DUCK = 40
+
+GROUND_Y = 137
+INK = 83  # #535353
+
+
+# scalar attributes of DinoSim making up the game state, see save_state
+STATE_ATTRIBUTES = [
+    'time', 'running_time', 'activated', 'playing_intro', 'intro_time', 'paused', 'playing', 'crashed',
+    'crash_time', 'distance_ran', 'current_speed', 'inverted', 'invert_timer', 'dino_x', 'dino_y',
+    'jump_velocity', 'jumping', 'ducking', 'reached_min_height', 'speed_drop', 'jump_count',
+]
+
+
+def js_round(x):
+    # Math.round rounds halves towards +infinity
+    return math.floor(x + 0.5)
+
+
+def box_compare(ax, ay, aw, ah, bx, by, bw, bh):
+    return ax < bx + bw and ax + aw > bx and ay < by + bh and ah + ay > by
+
+
+class Obstacle(object):
+    __slots__ = ['type_id', 'config', 'size', 'width', 'x_pos', 'y_pos', 'gap', 'speed_offset',
+                 'collision_boxes', 'remove', 'following_obstacle_created']
+
+    def __init__(self, type_id, speed, rng, gap_coefficient):
+        config = OBSTACLE_CONFIGS[type_id]
+        self.type_id = type_id
+        self.config = config
+        self.size = rng.randint(1, MAX_OBSTACLE_LENGTH)
+        self.x_pos = WIDTH + config['width']
+        self.remove = False
+        self.following_obstacle_created = False
+        boxes = [list(b) for b in config['collisionBoxes']]
+        if self.size > 1 and config['multipleSpeed'] > speed:
+            self.size = 1
+        self.width = config['width'] * self.size
+        y_pos = config['yPos']
+        self.y_pos = y_pos[rng.randint(0, len(y_pos) - 1)] if len(y_pos) > 1 else y_pos[0]
+        if self.size > 1:
+            boxes[1][2] = self.width - boxes[0][2] - boxes[2][2]
+            boxes[2][0] = self.width - boxes[2][2]
+        self.collision_boxes = boxes
+        self.speed_offset = 0
+        if config['speedOffset']:
+            self.speed_offset = config['speedOffset'] if rng.random() > .5 else -config['speedOffset']
+        min_gap = js_round(self.width * speed + config['minGap'] * gap_coefficient)
+        max_gap = js_round(min_gap * MAX_GAP_COEFFICIENT)
+        self.gap = rng.randint(min_gap, max_gap)
+
+    def update(self, delta_time, speed):
+        if not self.remove:
+            speed += self.speed_offset
+            self.x_pos -= math.floor((speed * FPS / 1000) * delta_time)
+            if not self.is_visible():
+                self.remove = True
+
+    def is_visible(self):
+        return self.x_pos + self.width > 0
+
+    def copy(self):
+        obstacle = Obstacle.__new__(Obstacle)
+        for name in Obstacle.__slots__:
+            setattr(obstacle, name, getattr(self, name))
+        obstacle.collision_boxes = [list(b) for b in self.collision_boxes]
+        return obstacle
+
+
+class DinoSim():
+    """A headless stand-in for `DinoGame` running the game in Python.
+
+    Each `step` advances `frames_per_step` frames of 1/60 s. The game is
+    deterministic given the seed passed to the constructor or `seed`.
+    """
+
+    def __init__(self, render=False, accelerate=False, autoscale=False, n_obstacles=3, capture='png',
+                 frame_size=(160, 80), crop=None, lockstep=True, frames_per_step=1, seed=None):
+        # the simulator always runs in lock-step
+        self.lockstep = True
+        self.n_obstacles = n_obstacles
+        self.capture = capture
+        self.frame_size = tuple(frame_size)
+        self.crop = list(crop) if crop is not None else None
+        self.frames_per_step = frames_per_step
+        self.config = dict(CONFIG)
+        self.rng = random.Random(seed)
+        self.time = 0.
+        self.obstacle_history = []
+        self.activated = False
+        self.playing_intro = False
+        self.intro_time = 0.
+        self.paused = False
+        self.playing = False
+        self._reset_runner()
+        self.dino_x = 0
+        self.defaults = self.get_parameters()  # default parameters
+        if not accelerate:
+            self.set_parameter('config.ACCELERATION', 0)
+        self._start()
+
+    def _start(self):
+        # finish the start-up jump and the intro, so restart() begins a running game
+        if not self.activated:
+            self.press_space()
+        while not self.activated or self.playing_intro:
+            self.advance(1)
+
+    def seed(self, seed=None):
+        self.rng.seed(seed)
+        self.obstacle_history = []
+        return seed
+
+    def evaluate(self, policies, max_steps=10000, seed=None, batch_size=None):
+        """Like DinoGame.evaluate, returns (scores, steps)."""
+        scores, steps = [], []
+        observation = np.empty(7, dtype=np.float32)
+        keys = [None, 'UP', 'DOWN']
+        self._start()  # all episodes start alike
+        for layers in policies:
+            check_policy(layers)
+            if seed is not None:
+                self.seed(seed)
+            self.restart()
+            n = 0
+            while n < max_steps and not self.crashed:
+                action = act(layers, ga_observation(self.get_state(), observation))
+                if keys[action]:
+                    self.press(keys[action])
+                self.advance(self.frames_per_step)
+                n += 1
+            scores.append(self.get_score())
+            steps.append(n)
+        return np.array(scores, dtype=np.int64), np.array(steps, dtype=np.int64)
+
+    def save_state(self):
+        state = {name: getattr(self, name) for name in STATE_ATTRIBUTES}
+        state['config'] = dict(self.config)
+        state['obstacles'] = [o.copy() for o in self.obstacles]
+        state['obstacle_history'] = list(self.obstacle_history)
+        state['rng'] = self.rng.getstate()
+        return state
+
+    def load_state(self, state):
+        for name in STATE_ATTRIBUTES:
+            setattr(self, name, state[name])
+        self.config = dict(state['config'])
+        self.obstacles = [o.copy() for o in state['obstacles']]
+        self.obstacle_history = list(state['obstacle_history'])
+        self.rng.setstate(state['rng'])
+
+    def _reset_runner(self):
+        self.running_time = 0.
+        self.crashed = False
+        self.crash_time = 0.
+        self.distance_ran = 0.
+        self.current_speed = self.config['SPEED']
+        self.obstacles = []
+        self.inverted = False
+        self.invert_timer = 0.
+        self._reset_trex()
+
+    def _reset_trex(self):
+        self.dino_y = TREX_GROUND_Y_POS
+        self.jump_velocity = 0.
+        self.jumping = False
+        self.ducking = False
+        self.reached_min_height = False
+        self.speed_drop = False
+        self.jump_count = 0
+
+    # Runner
+
+    def _update(self, delta_time):
+        if self.jumping:
+            self._update_jump(delta_time)
+        self.running_time += delta_time
+        has_obstacles = self.running_time > self.config['CLEAR_TIME']
+        if self.jump_count == 1 and not self.playing_intro and not self.activated:
+            self.playing_intro = True
+            self.activated = True
+        if self.playing_intro:
+            self._update_obstacles(0, has_obstacles)
+        else:
+            if not self.activated:
+                delta_time = 0
+            self._update_obstacles(delta_time, has_obstacles)
+        if has_obstacles and self.obstacles and self._check_collision(self.obstacles[0]):
+            self._game_over()
+        else:
+            self.distance_ran += self.current_speed * delta_time / FRAME_MS
+            if self.current_speed < self.config['MAX_SPEED']:
+                self.current_speed += self.config['ACCELERATION']
+        self._update_night_mode(delta_time)
+        if self.playing_intro:
+            if self.dino_x < TREX_START_X_POS:
+                self.dino_x += js_round((TREX_START_X_POS / TREX_INTRO_DURATION) * delta_time)
+            self.intro_time += delta_time
+            if self.intro_time >= TREX_INTRO_DURATION:
+                # startGame, fired by the end of the intro animation
+                self.running_time = 0.
+                self.playing_intro = False
+
+    def _update_night_mode(self, delta_time):
+        if self.invert_timer > self.config['INVERT_FADE_DURATION']:
+            self.invert_timer = 0.
+            self.inverted = not self.inverted
+        elif self.invert_timer:
+            self.invert_timer += delta_time
+        else:
+            actual_distance = self._actual_distance(math.ceil(self.distance_ran))
+            if actual_distance > 0 and not actual_distance % self.config['INVERT_DISTANCE']:
+                self.invert_timer += delta_time
+                self.inverted = not self.inverted
+
+    def _game_over(self):
+        self.playing = False
+        self.paused = True
+        self.crashed = True
+        self.crash_time = self.time
+
+    # Horizon
+
+    def _update_obstacles(self, delta_time, update_obstacles):
+        if not update_obstacles:
+            return
+        obstacles = self.obstacles
+        for obstacle in list(obstacles):
+            obstacle.update(delta_time, self.current_speed)
+            if obstacle.remove:
+                obstacles.pop(0)
+        if obstacles:
+            last = obstacles[-1]
+            if (not last.following_obstacle_created and last.is_visible()
+                    and last.x_pos + last.width + last.gap < WIDTH):
+                self._add_new_obstacle()
+                last.following_obstacle_created = True
+        else:
+            self._add_new_obstacle()
+
+    def _add_new_obstacle(self):
+        while True:
+            type_id = self.rng.randint(0, len(OBSTACLE_CONFIGS) - 1)
+            config = OBSTACLE_CONFIGS[type_id]
+            if not self._duplicate_obstacle(type_id) and self.current_speed >= config['minSpeed']:
+                break
+        self.obstacles.append(Obstacle(type_id, self.current_speed, self.rng, self.config['GAP_COEFFICIENT']))
+        self.obstacle_history.insert(0, type_id)
+        del self.obstacle_history[self.config['MAX_OBSTACLE_DUPLICATION']:]
+
+    def _duplicate_obstacle(self, type_id):
+        count = 0
+        for t in self.obstacle_history:
+            count = count + 1 if t == type_id else 0
+        return count >= self.config['MAX_OBSTACLE_DUPLICATION']
+
+    def _check_collision(self, obstacle):
+        tx, ty, tw, th = self.dino_x + 1, self.dino_y + 1, TREX_WIDTH - 2, TREX_HEIGHT - 2
+        ox, oy = obstacle.x_pos + 1, obstacle.y_pos + 1
+        ow, oh = obstacle.config['width'] * obstacle.size - 2, obstacle.config['height'] - 2
+        if not box_compare(tx, ty, tw, th, ox, oy, ow, oh):
+            return False
+        trex_boxes = TREX_BOXES_DUCKING if self.ducking else TREX_BOXES_RUNNING
+        for bx, by, bw, bh in trex_boxes:
+            for cx, cy, cw, ch in obstacle.collision_boxes:
+                if box_compare(bx + tx, by + ty, bw, bh, cx + ox, cy + oy, cw, ch):
+                    return True
+        return False
+
+    # Trex
+
+    def _start_jump(self):
+        if not self.jumping:
+            self.jump_velocity = TREX_INITIAL_JUMP_VELOCITY - self.current_speed / 10
+            self.jumping = True
+            self.reached_min_height = False
+            self.speed_drop = False
+
+    def _update_jump(self, delta_time):
+        frames_elapsed = delta_time / FRAME_MS
+        if self.speed_drop:
+            self.dino_y += js_round(self.jump_velocity * TREX_SPEED_DROP_COEFFICIENT * frames_elapsed)
+        else:
+            self.dino_y += js_round(self.jump_velocity * frames_elapsed)
+        self.jump_velocity += TREX_GRAVITY * frames_elapsed
+        if self.dino_y < TREX_GROUND_Y_POS - TREX_MIN_JUMP_HEIGHT or self.speed_drop:
+            self.reached_min_height = True
+        if self.dino_y < TREX_MAX_JUMP_HEIGHT or self.speed_drop:
+            self._end_jump()
+        if self.dino_y > TREX_GROUND_Y_POS:
+            self._reset_trex()
+            self.jump_count += 1
+
+    def _end_jump(self):
+        if self.reached_min_height and self.jump_velocity < TREX_DROP_VELOCITY:
+            self.jump_velocity = TREX_DROP_VELOCITY
+
+    # Keyboard
+
+    def key_down(self, keycode):
+        if keycode in KEY_JUMP:
+            if not self.crashed:
+                if not self.playing:
+                    self.playing = True
+                    self.paused = False
+                if not self.jumping and not self.ducking:
+                    self._start_jump()
+        elif self.playing and keycode == KEY_DUCK:
+            if self.jumping:
+                self.speed_drop = True
+                self.jump_velocity = 1
+            elif not self.ducking:
+                self.ducking = True
+
+    def key_up(self, keycode):
+        if self.playing and keycode in KEY_JUMP:
+            self._end_jump()
+        elif keycode == KEY_DUCK:
+            self.speed_drop = False
+            self.ducking = False
+        elif self.crashed and keycode in KEY_JUMP:
+            if self.time - self.crash_time >= self.config['GAMEOVER_CLEAR_TIME']:
+                self.restart()
+
+    # DinoGame interface
+
+    def get_parameters(self):
+        params = {}
+        params['config.ACCELERATION'] = self.config['ACCELERATION']
+        return params
+
+    def set_parameter(self, key, value):
+        assert key.startswith('config.'), 'Unsupported parameter: ' + key
+        self.config[key[len('config.'):]] = value
+
+    def restore_parameter(self, key):
+        self.set_parameter(key, self.defaults[key])
+
+    def is_crashed(self):
+        return self.crashed
+
+    def is_inverted(self):
+        return self.inverted
+
+    def is_paused(self):
+        return self.paused
+
+    def is_playing(self):
+        return self.playing
+
+    def press(self, key):
+        keycode = {'SPACE': 32, 'UP': 38, 'DOWN': 40}[key]
+        self.key_down(keycode)
+        self.key_up(keycode)
+
+    def press_space(self):
+        return self.press('SPACE')
+
+    def press_up(self):
+        return self.press('UP')
+
+    def press_down(self):
+        return self.press('DOWN')
+
+    def pause(self):
+        self.playing = False
+        self.paused = True
+
+    def resume(self):
+        if not self.crashed:
+            self.playing = True
+            self.paused = False
+
+    def restart(self):
+        self._reset_runner()
+        self.playing = True
+        self.paused = False
+
+    def close(self):
+        pass
+
+    def advance(self, frames=1):
+        for _ in range(frames):
+            self.time += FRAME_MS
+            if self.playing:
+                self._update(FRAME_MS)
+
+    def _actual_distance(self, distance):
+        return js_round(distance * DISTANCE_COEFFICIENT) if distance else 0
+
+    def get_score(self):
+        return min(self._actual_distance(math.ceil(self.distance_ran)), MAX_SCORE)
+
+    def get_dino_x_position(self):
+        return self.dino_x
+
+    def get_dino_y_position(self):
+        return self.dino_y
+
+    def get_speed(self):
+        return self.current_speed
+
+    def get_state(self):
+        values = [self.dino_x, self.dino_y, self.current_speed, self.crashed, self.playing,
+                  self.get_score(), min(len(self.obstacles), self.n_obstacles), self.jumping, self.ducking,
+                  self.inverted]
+        for i in range(self.n_obstacles):
+            if i < len(self.obstacles):
+                o = self.obstacles[i]
+                values += [o.type_id + 1, o.x_pos, o.y_pos, o.width, o.config['height'], o.speed_offset]
+            else:
+                values += EMPTY_OBSTACLE
+        return unpack_state(values, self.n_obstacles)
+
+    def get_nearest_obstacle_width(self):
+        return self.obstacles[0].config['width'] if self.obstacles else 0
+
+    def get_nearest_obstacle_height(self):
+        return self.obstacles[0].config['height'] if self.obstacles else 0
+
+    def get_nearest_obstacle_x_distance(self):
+        return (self.obstacles[0].x_pos if self.obstacles else 600) - self.dino_x
+
+    def get_nearest_obstacle_y_distance(self):
+        return (self.obstacles[0].y_pos if self.obstacles else 150) - self.dino_y
+
+    def render(self):
+        """Draw the collision boxes of the scene as a (150, 600) grayscale canvas."""
+        canvas = np.full((HEIGHT, WIDTH), 255, dtype=np.uint8)
+        canvas[GROUND_Y] = INK
+        trex_boxes = TREX_BOXES_DUCKING if self.ducking else TREX_BOXES_RUNNING
+        boxes = [(self.dino_x + x, self.dino_y + y, w, h) for x, y, w, h in trex_boxes]
+        for o in self.obstacles:
+            boxes += [(o.x_pos + x, o.y_pos + y, w, h) for x, y, w, h in o.collision_boxes]
+        for x, y, w, h in boxes:
+            x0, y0 = max(int(x), 0), max(int(y), 0)
+            canvas[y0:max(int(y + h), 0), x0:max(int(x + w), 0)] = INK
+        if self.inverted:
+            np.subtract(255, canvas, out=canvas)
+        return canvas
+
+    def get_frame(self):
+        canvas = self.render()
+        if self.capture != 'gray':
+            return np.repeat(canvas[:, :, None], 3, axis=2)
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            canvas = canvas[y:y + h, x:x + w]
+        frame = cv2.resize(canvas, self.frame_size, interpolation=cv2.INTER_AREA)
+        return frame[:, :, None]
+
+    def step(self, key=None, frame=False, repeat=1):
+        previous = None
+        for self.repeats in range(1, repeat + 1):
+            if key:
+                self.press(key)
+            self.advance(self.frames_per_step)
+            if self.crashed:
+                break
+            if frame and self.repeats == repeat - 1:
+                previous = self.get_frame()
+        image = self.get_frame() if frame else None
+        if previous is not None:
+            np.maximum(image, previous, out=image)
+        return self.get_state(), image
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A batched version of `DinoSim` stepping N games with array operations.
+
+The state of all games is kept in struct-of-arrays form and every rule of
+`DinoSim` is applied to the whole batch at once. Games start right after the
+intro (like every restart of the browser game). Crashed games stay frozen
+until they are reset, which the vector env does right after each step.
+"""
+
+import numpy as np
+
+from gym_chrome_dino.game.dino_sim import (
+    CONFIG, FPS, FRAME_MS, GROUND_Y, HEIGHT, INK, MAX_GAP_COEFFICIENT, MAX_OBSTACLE_LENGTH, OBSTACLE_CONFIGS,
+    TREX_BOXES_DUCKING, TREX_BOXES_RUNNING, TREX_DROP_VELOCITY, TREX_GRAVITY, TREX_GROUND_Y_POS, TREX_HEIGHT,
+    TREX_INITIAL_JUMP_VELOCITY, TREX_MAX_JUMP_HEIGHT, TREX_MIN_JUMP_HEIGHT, TREX_SPEED_DROP_COEFFICIENT,
+    TREX_START_X_POS, TREX_WIDTH, WIDTH, DISTANCE_COEFFICIENT, MAX_SCORE,
+)
+from gym_chrome_dino.game.state import EMPTY_OBSTACLE
+
+MAX_SLOTS = 5  # obstacles are at least ~170px apart, so at most 4 are alive at once
+MAX_BOXES = 6
+
+
+def js_round(x):
+    return np.floor(x + .5)
+
+
+def _box_table():
+    # collision boxes per (type, size) padded to MAX_BOXES, as in Obstacle.init
+    n_types = len(OBSTACLE_CONFIGS)
+    boxes = np.zeros((n_types, MAX_OBSTACLE_LENGTH + 1, MAX_BOXES, 4), dtype=np.float64)
+    valid = np.zeros((n_types, MAX_OBSTACLE_LENGTH + 1, MAX_BOXES), dtype=bool)
+    for t, config in enumerate(OBSTACLE_CONFIGS):
+        for size in range(1, MAX_OBSTACLE_LENGTH + 1):
+            b = np.array(config['collisionBoxes'], dtype=np.float64)
+            if size > 1:
+                width = config['width'] * size
+                b[1, 2] = width - b[0, 2] - b[2, 2]
+                b[2, 0] = width - b[2, 2]
+            boxes[t, size, :len(b)] = b
+            valid[t, size, :len(b)] = True
+    return boxes, valid
+
+
+def _trex_table():
+    boxes = np.zeros((2, MAX_BOXES, 4), dtype=np.float64)
+    valid = np.zeros((2, MAX_BOXES), dtype=bool)
+    for i, b in enumerate([TREX_BOXES_RUNNING, TREX_BOXES_DUCKING]):
+        boxes[i, :len(b)] = b
+        valid[i, :len(b)] = True
+    return boxes, valid
+
+
+OBSTACLE_BOXES, OBSTACLE_BOXES_VALID = _box_table()
+TREX_BOXES, TREX_BOXES_VALID = _trex_table()
+TYPE_WIDTH = np.array([c['width'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_HEIGHT = np.array([c['height'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_MULTIPLE_SPEED = np.array([c['multipleSpeed'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_MIN_GAP = np.array([c['minGap'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_MIN_SPEED = np.array([c['minSpeed'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_SPEED_OFFSET = np.array([c['speedOffset'] for c in OBSTACLE_CONFIGS], dtype=np.float64)
+TYPE_Y_POS = [np.array(c['yPos'], dtype=np.float64) for c in OBSTACLE_CONFIGS]
+
+
+def _box_overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    return (ax < bx + bw) & (ax + aw > bx) & (ay < by + bh) & (ah + ay > by)
+
+
+class VecDinoSim():
+    """N headless Dino games advanced together by `step(actions)`.
+
+    Actions follow ChromeDinoGAEnv: 0 is NOOP, 1 presses UP and 2 presses
+    DOWN. Each step advances `frames_per_step` frames of 1/60 s.
+    """
+
+    def __init__(self, num_games, accelerate=False, frames_per_step=1, seed=None):
+        self.num_games = num_games
+        self.frames_per_step = frames_per_step
+        self.config = dict(CONFIG)
+        if not accelerate:
+            self.config['ACCELERATION'] = 0
+        self.rng = np.random.default_rng(seed)
+        n, m = num_games, MAX_SLOTS
+        self.dino_x = np.full(n, TREX_START_X_POS, dtype=np.float64)
+        self.dino_y = np.zeros(n)
+        self.jump_velocity = np.zeros(n)
+        self.jumping = np.zeros(n, dtype=bool)
+        self.ducking = np.zeros(n, dtype=bool)
+        self.reached_min_height = np.zeros(n, dtype=bool)
+        self.speed_drop = np.zeros(n, dtype=bool)
+        self.running_time = np.zeros(n)
+        self.distance_ran = np.zeros(n)
+        self.current_speed = np.zeros(n)
+        self.crashed = np.zeros(n, dtype=bool)
+        self.inverted = np.zeros(n, dtype=bool)
+        self.invert_timer = np.zeros(n)
+        self.history = np.full((n, 2), -1, dtype=np.int64)
+        self.num_obstacles = np.zeros(n, dtype=np.int64)
+        self.o_type = np.full((n, m), -1, dtype=np.int64)
+        self.o_size = np.zeros((n, m), dtype=np.int64)
+        self.o_x = np.zeros((n, m))
+        self.o_y = np.zeros((n, m))
+        self.o_width = np.zeros((n, m))
+        self.o_gap = np.zeros((n, m))
+        self.o_speed_offset = np.zeros((n, m))
+        self.o_following = np.zeros((n, m), dtype=bool)
+        self.reset()
+
+    def seed(self, seed=None):
+        # an int or a sequence of ints, e.g. one seed per game
+        self.rng = np.random.default_rng(seed)
+        return seed
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        self.dino_y[mask] = TREX_GROUND_Y_POS
+        self.jump_velocity[mask] = 0
+        self.jumping[mask] = False
+        self.ducking[mask] = False
+        self.reached_min_height[mask] = False
+        self.speed_drop[mask] = False
+        self.running_time[mask] = 0
+        self.distance_ran[mask] = 0
+        self.current_speed[mask] = self.config['SPEED']
+        self.crashed[mask] = False
+        self.inverted[mask] = False
+        self.invert_timer[mask] = 0
+        self.num_obstacles[mask] = 0
+        self.o_type[mask] = -1
+
+    def get_score(self):
+        distance = np.ceil(self.distance_ran)
+        return np.minimum(np.where(distance > 0, js_round(distance * DISTANCE_COEFFICIENT), 0), MAX_SCORE)
+
+    # keyboard, keydown immediately followed by keyup as in DinoGame.press
+
+    def _press(self, actions):
+        up = actions == 1
+        start = up & ~self.jumping & ~self.ducking
+        self.jump_velocity[start] = TREX_INITIAL_JUMP_VELOCITY - self.current_speed[start] / 10
+        self.jumping[start] = True
+        self.reached_min_height[start] = False
+        self.speed_drop[start] = False
+        self._end_jump(up)
+        # ducking and speed drop are released by the keyup, only the jump velocity sticks
+        drop = (actions == 2) & self.jumping
+        self.jump_velocity[drop] = 1
+        self.speed_drop[actions == 2] = False
+        self.ducking[actions == 2] = False
+
+    def _end_jump(self, mask):
+        mask = mask & self.reached_min_height & (self.jump_velocity < TREX_DROP_VELOCITY)
+        self.jump_velocity[mask] = TREX_DROP_VELOCITY
+
+    def _update_jump(self, dt, active):
+        j = self.jumping & active
+        frames = dt / FRAME_MS
+        coefficient = np.where(self.speed_drop, TREX_SPEED_DROP_COEFFICIENT, 1)
+        self.dino_y[j] += js_round(self.jump_velocity[j] * coefficient[j] * frames)
+        self.jump_velocity[j] += TREX_GRAVITY * frames
+        self.reached_min_height |= j & ((self.dino_y < TREX_GROUND_Y_POS - TREX_MIN_JUMP_HEIGHT) | self.speed_drop)
+        self._end_jump(j & ((self.dino_y < TREX_MAX_JUMP_HEIGHT) | self.speed_drop))
+        landed = j & (self.dino_y > TREX_GROUND_Y_POS)
+        self.dino_y[landed] = TREX_GROUND_Y_POS
+        self.jump_velocity[landed] = 0
+        self.jumping[landed] = False
+        self.ducking[landed] = False
+        self.speed_drop[landed] = False
+
+    # horizon
+
+    def _update_obstacles(self, dt, active):
+        valid = np.arange(MAX_SLOTS) < self.num_obstacles[:, None]
+        moving = valid & active[:, None]
+        speed = self.current_speed[:, None] + self.o_speed_offset
+        self.o_x -= np.where(moving, np.floor((speed * FPS / 1000) * dt), 0)
+        # obstacles leave in order, so only the head of the queue can disappear
+        while True:
+            gone = active & (self.num_obstacles > 0) & (self.o_x[:, 0] + self.o_width[:, 0] <= 0)
+            if not gone.any():
+                break
+            for a in (self.o_type, self.o_size, self.o_x, self.o_y, self.o_width, self.o_gap,
+                      self.o_speed_offset, self.o_following):
+                a[gone, :-1] = a[gone, 1:]
+            self.o_type[gone, -1] = -1
+            self.num_obstacles[gone] -= 1
+        rows = np.arange(self.num_games)
+        last = np.maximum(self.num_obstacles - 1, 0)
+        following = (
+            (self.num_obstacles > 0) & ~self.o_following[rows, last]
+            & (self.o_x[rows, last] + self.o_width[rows, last] > 0)
+            & (self.o_x[rows, last] + self.o_width[rows, last] + self.o_gap[rows, last] < WIDTH)
+        )
+        spawn = active & ((self.num_obstacles == 0) | following) & (self.num_obstacles < MAX_SLOTS)
+        self.o_following[rows[spawn & following], last[spawn & following]] = True
+        if spawn.any():
+            self._add_new_obstacles(np.flatnonzero(spawn))
+
+    def _add_new_obstacles(self, idx):
+        speed = self.current_speed[idx]
+        types = np.empty(len(idx), dtype=np.int64)
+        todo = np.arange(len(idx))
+        while len(todo):
+            t = self.rng.integers(0, len(OBSTACLE_CONFIGS), size=len(todo))
+            history = self.history[idx[todo]]
+            duplicate = (history[:, 0] == t) & (history[:, 1] == t)
+            ok = ~duplicate & (speed[todo] >= TYPE_MIN_SPEED[t])
+            types[todo[ok]] = t[ok]
+            todo = todo[~ok]
+        size = self.rng.integers(1, MAX_OBSTACLE_LENGTH + 1, size=len(idx))
+        size[(size > 1) & (TYPE_MULTIPLE_SPEED[types] > speed)] = 1
+        width = TYPE_WIDTH[types] * size
+        y = np.empty(len(idx))
+        for t, y_pos in enumerate(TYPE_Y_POS):
+            sel = types == t
+            y[sel] = y_pos[self.rng.integers(0, len(y_pos), size=sel.sum())]
+        sign = np.where(self.rng.random(len(idx)) > .5, 1., -1.)
+        min_gap = js_round(width * speed + TYPE_MIN_GAP[types] * self.config['GAP_COEFFICIENT'])
+        max_gap = js_round(min_gap * MAX_GAP_COEFFICIENT)
+        gap = np.floor(self.rng.random(len(idx)) * (max_gap - min_gap + 1)) + min_gap
+        slot = self.num_obstacles[idx]
+        self.o_type[idx, slot] = types
+        self.o_size[idx, slot] = size
+        self.o_x[idx, slot] = WIDTH + TYPE_WIDTH[types]
+        self.o_y[idx, slot] = y
+        self.o_width[idx, slot] = width
+        self.o_gap[idx, slot] = gap
+        self.o_speed_offset[idx, slot] = sign * TYPE_SPEED_OFFSET[types]
+        self.o_following[idx, slot] = False
+        self.num_obstacles[idx] += 1
+        self.history[idx, 1] = self.history[idx, 0]
+        self.history[idx, 0] = types
+
+    def _check_collision(self, active):
+        check = active & (self.num_obstacles > 0)
+        t = np.maximum(self.o_type[:, 0], 0)
+        size = self.o_size[:, 0]
+        tx, ty = self.dino_x + 1, self.dino_y + 1
+        ox, oy = self.o_x[:, 0] + 1, self.o_y[:, 0] + 1
+        outer = check & _box_overlap(
+            tx, ty, TREX_WIDTH - 2, TREX_HEIGHT - 2,
+            ox, oy, TYPE_WIDTH[t] * size - 2, TYPE_HEIGHT[t] - 2,
+        )
+        trex = TREX_BOXES[self.ducking.astype(np.int64)][:, :, None]  # (n, 6, 1, 4)
+        trex_valid = TREX_BOXES_VALID[self.ducking.astype(np.int64)][:, :, None]
+        obstacle = OBSTACLE_BOXES[t, size][:, None]  # (n, 1, 6, 4)
+        obstacle_valid = OBSTACLE_BOXES_VALID[t, size][:, None]
+        hit = _box_overlap(
+            trex[..., 0] + tx[:, None, None], trex[..., 1] + ty[:, None, None], trex[..., 2], trex[..., 3],
+            obstacle[..., 0] + ox[:, None, None], obstacle[..., 1] + oy[:, None, None],
+            obstacle[..., 2], obstacle[..., 3],
+        )
+        return outer & (hit & trex_valid & obstacle_valid).any(axis=(1, 2))
+
+    def _update(self, dt):
+        active = ~self.crashed
+        self._update_jump(dt, active)
+        self.running_time[active] += dt
+        has_obstacles = active & (self.running_time > self.config['CLEAR_TIME'])
+        self._update_obstacles(dt, has_obstacles)
+        collision = self._check_collision(has_obstacles)
+        alive = active & ~collision
+        self.distance_ran[alive] += self.current_speed[alive] * dt / FRAME_MS
+        self.current_speed[alive & (self.current_speed < self.config['MAX_SPEED'])] += self.config['ACCELERATION']
+        self.crashed |= collision
+        # night mode
+        fade = active & (self.invert_timer > self.config['INVERT_FADE_DURATION'])
+        fading = active & ~fade & (self.invert_timer > 0)
+        score = self.get_score()
+        trigger = active & (self.invert_timer == 0) & (score > 0) & (score % self.config['INVERT_DISTANCE'] == 0)
+        self.invert_timer[fade] = 0
+        self.invert_timer[fading | trigger] += dt
+        self.inverted ^= fade | trigger
+
+    def step(self, actions):
+        """Advance every running game and return (scores, crashed)."""
+        self._press(np.asarray(actions) * ~self.crashed)
+        for _ in range(self.frames_per_step):
+            self._update(FRAME_MS)
+        return self.get_score(), self.crashed.copy()
+
+    def ga_observation(self, out=None):
+        """The ChromeDinoGAEnv 7-feature observation of every game, shape (N, 7)."""
+        if out is None:
+            out = np.empty((self.num_games, 7), dtype=np.float32)
+        has = self.num_obstacles > 0
+        t = np.maximum(self.o_type[:, 0], 0)
+        out[:, 0] = np.where(has, self.o_x[:, 0], EMPTY_OBSTACLE[1]) - self.dino_x
+        out[:, 1] = np.where(has, self.o_y[:, 0], EMPTY_OBSTACLE[2]) - self.dino_y
+        out[:, 2] = self.dino_x
+        out[:, 3] = self.dino_y
+        out[:, 4] = np.where(has, TYPE_WIDTH[t], EMPTY_OBSTACLE[3])
+        out[:, 5] = np.where(has, TYPE_HEIGHT[t], EMPTY_OBSTACLE[4])
+        out[:, 6] = self.current_speed
+        return out
+
+    def render(self, width=160, height=80):
+        """Rasterize the collision boxes of every game, shape (N, height, width, 1)."""
+        n = self.num_games
+        trex = TREX_BOXES[self.ducking.astype(np.int64)]  # (n, 6, 4)
+        trex_valid = TREX_BOXES_VALID[self.ducking.astype(np.int64)]
+        t = np.maximum(self.o_type, 0)
+        obstacle = OBSTACLE_BOXES[t, self.o_size]  # (n, m, 6, 4)
+        obstacle_valid = OBSTACLE_BOXES_VALID[t, self.o_size] & (self.o_type >= 0)[..., None]
+        x = np.concatenate([trex[..., 0] + self.dino_x[:, None],
+                            (obstacle[..., 0] + self.o_x[..., None]).reshape(n, -1)], axis=1)
+        y = np.concatenate([trex[..., 1] + self.dino_y[:, None],
+                            (obstacle[..., 1] + self.o_y[..., None]).reshape(n, -1)], axis=1)
+        w = np.concatenate([trex[..., 2], obstacle[..., 2].reshape(n, -1)], axis=1)
+        h = np.concatenate([trex[..., 3], obstacle[..., 3].reshape(n, -1)], axis=1)
+        valid = np.concatenate([trex_valid, obstacle_valid.reshape(n, -1)], axis=1)
+        # pixel centers in canvas coordinates
+        cols = (np.arange(width) + .5) * WIDTH / width
+        rows = (np.arange(height) + .5) * HEIGHT / height
+        in_x = (cols >= x[..., None]) & (cols < (x + w)[..., None]) & valid[..., None]  # (n, b, width)
+        in_y = (rows >= y[..., None]) & (rows < (y + h)[..., None])  # (n, b, height)
+        ink = np.matmul(in_y.transpose(0, 2, 1).astype(np.float32), in_x.astype(np.float32)) > 0
+        ink[:, int(GROUND_Y * height / HEIGHT)] = True
+        frames = np.where(ink, INK, 255).astype(np.uint8)
+        frames[self.inverted] = 255 - frames[self.inverted]
+        return frames[..., None]
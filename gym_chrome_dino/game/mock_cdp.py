@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A local stand-in for a Chrome DevTools endpoint, for tests.
+
+`MockCDPServer` serves /json/version and /json/list over HTTP and a page
+target over websocket on the same port. Every command received is stored
+in `messages` and answered with `handler(method, params)`, which returns
+the result dict or raises to send an error. `emit` pushes events to the
+connected clients.
+"""
+
+import base64
+import hashlib
+import json
+import socket
+import socketserver
+import threading
+
+from gym_chrome_dino.game.cdp import OP_TEXT, recv_message, send_frame
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def default_handler(method, params):
+    if method == 'Runtime.evaluate':
+        return {'result': {'type': 'undefined'}}
+    return {}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server.mock
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(1024)
+            if not chunk:
+                return
+            request += chunk
+        head = request.split(b'\r\n\r\n', 1)[0].decode()
+        path = head.split(' ')[1]
+        headers = dict(
+            (k.strip().lower(), v.strip()) for k, v in (line.split(':', 1) for line in head.split('\r\n')[1:])
+        )
+        if headers.get('upgrade', '').lower() == 'websocket':
+            self._websocket(server, sock, headers)
+        else:
+            self._http(server, sock, path)
+
+    def _http(self, server, sock, path):
+        if path.startswith('/json/version'):
+            body = {'Browser': 'MockCDP/1.0', 'webSocketDebuggerUrl': server.ws_url}
+        elif path.startswith('/json'):
+            body = [{'type': 'page', 'id': 'mock', 'url': 'about:blank', 'webSocketDebuggerUrl': server.ws_url}]
+        else:
+            sock.sendall(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+            return
+        data = json.dumps(body).encode()
+        sock.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % len(data)
+                     + data)
+
+    def _websocket(self, server, sock, headers):
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest())
+        sock.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        lock = threading.Lock()
+        server._clients.append((sock, lock))
+        try:
+            while True:
+                _, payload = recv_message(sock)
+                message = json.loads(payload.decode())
+                server.messages.append(message)
+                try:
+                    response = {'id': message['id'], 'result': server.handler(message['method'], message['params'])}
+                except Exception as e:
+                    response = {'id': message['id'], 'error': {'code': -32000, 'message': str(e)}}
+                with lock:
+                    send_frame(sock, OP_TEXT, json.dumps(response).encode(), mask=False)
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            server._clients.remove((sock, lock))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MockCDPServer():
+    def __init__(self, handler=None, host='127.0.0.1', port=0):
+        self.handler = handler or default_handler
+        self.messages = []
+        self._clients = []
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self.host, self.port = self._server.server_address
+        self.ws_url = 'ws://{}:{}/devtools/page/mock'.format(self.host, self.port)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def emit(self, method, params=None):
+        data = json.dumps({'method': method, 'params': params or {}}).encode()
+        for sock, lock in list(self._clients):
+            with lock:
+                send_frame(sock, OP_TEXT, data, mask=False)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        for sock, _ in list(self._clients):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
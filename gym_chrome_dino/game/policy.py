@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Small feed-forward policies over the ChromeDinoGAEnv observation.
+
+A policy is a list of (weights, bias) layers, weights of shape
+(outputs, inputs), with tanh between layers. The first layer takes the 7
+features of ga_observation and the last one gives a score for each of the 3
+actions of ChromeDinoGAEnv; the action is the argmax. `DinoGame.evaluate`
+runs such policies inside the page, `DinoSim.evaluate` in Python.
+"""
+
+import numpy as np
+
+N_FEATURES = 7
+N_ACTIONS = 3
+
+
+def linear_policy(weights, bias=None):
+    weights = np.asarray(weights, dtype=np.float64).reshape(N_ACTIONS, N_FEATURES)
+    bias = np.zeros(N_ACTIONS) if bias is None else np.asarray(bias, dtype=np.float64)
+    return [(weights, bias)]
+
+
+def mlp_policy(genome, hidden=(8,)):
+    """Unflatten a genome vector into an MLP with `hidden` layer sizes."""
+    genome = np.asarray(genome, dtype=np.float64)
+    sizes = (N_FEATURES,) + tuple(hidden) + (N_ACTIONS,)
+    assert genome.size == genome_size(hidden), 'genome has {} values, expected {}'.format(
+        genome.size, genome_size(hidden))
+    layers, i = [], 0
+    for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+        weights = genome[i:i + n_in * n_out].reshape(n_out, n_in)
+        i += n_in * n_out
+        layers.append((weights, genome[i:i + n_out]))
+        i += n_out
+    return layers
+
+
+def genome_size(hidden=(8,)):
+    sizes = (N_FEATURES,) + tuple(hidden) + (N_ACTIONS,)
+    return sum((n_in + 1) * n_out for n_in, n_out in zip(sizes[:-1], sizes[1:]))
+
+
+def check_policy(layers):
+    n_in = N_FEATURES
+    for weights, bias in layers:
+        weights, bias = np.asarray(weights), np.asarray(bias)
+        assert weights.shape == (len(bias), n_in), 'layer of shape {} after {} inputs'.format(weights.shape, n_in)
+        n_in = len(bias)
+    assert n_in == N_ACTIONS, 'the last layer must have {} outputs'.format(N_ACTIONS)
+
+
+def pack_policy(layers):
+    """The policy as nested lists, the form the page script takes."""
+    check_policy(layers)
+    return [[np.asarray(w, dtype=np.float64).tolist(), np.asarray(b, dtype=np.float64).tolist()]
+            for w, b in layers]
+
+
+def act(layers, observation):
+    x = np.asarray(observation, dtype=np.float64)
+    for i, (weights, bias) in enumerate(layers):
+        x = np.dot(weights, x) + bias
+        if i + 1 < len(layers):
+            x = np.tanh(x)
+    return int(np.argmax(x))
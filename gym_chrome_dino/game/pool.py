@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""A process-wide pool of launched games.
+
+Launching Chrome and loading the game takes seconds. Envs made with
+`pool=True` take a game from `POOL` instead and give it back on `close()`;
+`prewarm` launches games in the background before they are needed. Games
+are pooled per configuration (backend and constructor arguments) and are
+restarted with their parameters restored before they are handed out again.
+"""
+
+import atexit
+import inspect
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+from gym_chrome_dino.game import BACKENDS
+
+CLEAN_STATE = '''
+var r = Runner.instance_;
+r.stop();
+r.restart();
+'''
+
+
+def _key(backend, render, accelerate, autoscale, game_kwargs):
+    # defaults are filled in, so an explicit default argument maps to the same games
+    arguments = inspect.signature(BACKENDS[backend]).bind(render, accelerate, autoscale, **game_kwargs)
+    arguments.apply_defaults()
+    return repr((backend, sorted(arguments.arguments.items())))
+
+
+class GamePool():
+    """Idle games per configuration, at most `max_idle` each."""
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._idle = {}
+        self._configs = {}
+        self._targets = {}
+        self._launching = {}
+        self._leased = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _launch(self, key):
+        backend, render, accelerate, autoscale, game_kwargs = self._configs[key]
+        return BACKENDS[backend](render, accelerate, autoscale, **game_kwargs)
+
+    def _launch_idle(self, key):
+        try:
+            game = self._launch(key)
+        except Exception:
+            game = None
+        with self._lock:
+            self._launching[key] -= 1
+            if game is not None and len(self._idle[key]) < self.max_idle:
+                self._idle[key].append(game)
+                game = None
+        if game is not None:
+            game.close()
+
+    def _refill(self, key):
+        # called with the lock held: launch games until the warm target is met
+        missing = self._targets.get(key, 0) - len(self._idle[key]) - self._launching[key]
+        for _ in range(max(0, missing)):
+            self._launching[key] += 1
+            thread = threading.Thread(target=self._launch_idle, args=(key,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    def _register(self, backend, render, accelerate, autoscale, game_kwargs):
+        key = _key(backend, render, accelerate, autoscale, game_kwargs)
+        if key not in self._configs:
+            self._configs[key] = (backend, render, accelerate, autoscale, dict(game_kwargs))
+            self._idle[key] = []
+            self._launching[key] = 0
+        return key
+
+    def prewarm(self, n, backend='chrome', render=False, accelerate=False, autoscale=False, **game_kwargs):
+        """Keep `n` idle games of this configuration launched in the background."""
+        with self._lock:
+            key = self._register(backend, render, accelerate, autoscale, game_kwargs)
+            self._targets[key] = min(n, self.max_idle)
+            self._refill(key)
+
+    def acquire(self, backend='chrome', render=False, accelerate=False, autoscale=False, **game_kwargs):
+        """An idle game of this configuration, or a newly launched one."""
+        with self._lock:
+            key = self._register(backend, render, accelerate, autoscale, game_kwargs)
+        while True:
+            with self._lock:
+                game = self._idle[key].pop() if self._idle[key] else None
+                self._refill(key)
+            if game is None:
+                game = self._launch(key)
+                break
+            try:
+                game.is_playing()  # the browser may have died while idle
+                break
+            except WebDriverException:
+                self._close(game)
+        with self._lock:
+            self._leased[id(game)] = key
+        return game
+
+    def release(self, game):
+        """Take a game back; it is restarted and kept if there is room."""
+        with self._lock:
+            key = self._leased.pop(id(game), None)
+        if key is None:
+            return game.close()
+        try:
+            self._clean(game, self._configs[key][2])
+        except WebDriverException:
+            return self._close(game)
+        with self._lock:
+            if len(self._idle[key]) < self.max_idle:
+                self._idle[key].append(game)
+                return
+        game.close()
+
+    def _clean(self, game, accelerate):
+        if hasattr(game, 'execute'):
+            game.execute(CLEAN_STATE)
+        else:
+            game.restart()
+        if accelerate:
+            game.restore_parameter('config.ACCELERATION')
+        else:
+            game.set_parameter('config.ACCELERATION', 0)
+
+    @staticmethod
+    def _close(game):
+        try:
+            game.close()
+        except Exception:
+            pass
+
+    def clear(self):
+        """Close every idle game and stop prewarming."""
+        with self._lock:
+            self._targets = {}
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            games = [game for games in self._idle.values() for game in games]
+            for games in self._idle.values():
+                del games[:]
+        for game in games:
+            self._close(game)
+
+
+POOL = GamePool()
+atexit.register(POOL.clear)
+
+prewarm = POOL.prewarm
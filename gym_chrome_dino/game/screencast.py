@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Frames pushed by the browser with `Page.startScreencast`.
+
+The CDP reader thread stores every `Page.screencastFrame` in a bounded ring
+buffer and acknowledges it at once, so Chrome keeps sending while Python is
+busy elsewhere. Frames are only decoded when they are taken. A frame that
+is overwritten or skipped before it was taken counts as dropped. Frames are
+lossless PNG by default; 'jpeg' is smaller but blurs the sprites.
+"""
+
+import base64
+import collections
+import io
+import itertools
+import threading
+
+import numpy as np
+from PIL import Image
+
+from gym_chrome_dino.game.cdp import CDPError
+from gym_chrome_dino.utils.helpers import rgba2rgb
+
+Frame = collections.namedtuple('Frame', ['frame_id', 'timestamp', 'image'])
+
+
+class FrameStream():
+    """Ring buffer of screencast frames of one CDP session.
+
+    `clip` is (left, top, width, height) in CSS pixels of the viewport and
+    `size` the (width, height) frames are scaled to, usually the canvas rect
+    and its size in canvas pixels.
+    """
+
+    def __init__(self, cdp, clip=None, size=None, buffer_size=8, format='png', quality=90):
+        self.cdp = cdp
+        self.clip = clip
+        self.size = size
+        self.format = format
+        self.quality = quality
+        self.received = 0
+        self.dropped = 0
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self.newest_id = 0  # id of the newest frame received
+        self.last = None
+        self._cond = threading.Condition()
+        self.running = False
+
+    def start(self):
+        self.cdp.on('Page.screencastFrame', self._on_frame)
+        params = {'format': self.format, 'everyNthFrame': 1}
+        if self.format == 'jpeg':
+            params['quality'] = self.quality
+        self.cdp.call('Page.startScreencast', params)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.cdp.off('Page.screencastFrame', self._on_frame)
+        if not self.cdp.closed:
+            self.cdp.send('Page.stopScreencast')
+
+    def _on_frame(self, params):
+        # runs on the reader thread: acknowledge and store, no decoding here
+        self.cdp.send('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+        metadata = params.get('metadata', {})
+        with self._cond:
+            self.received += 1
+            self.newest_id = next(self._ids)
+            self._buffer.append((self.newest_id, metadata.get('timestamp'), params['data'], metadata))
+            self._cond.notify_all()
+
+    def wait(self, after=0, timeout=None):
+        """Block until a frame newer than frame id `after` arrived."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer and self._buffer[-1][0] > after, timeout):
+                raise CDPError('Timed out waiting for a screencast frame')
+
+    def latest(self, timeout=None):
+        """The newest frame; waits for the first one if none arrived yet."""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait_for(lambda: self._buffer, timeout)
+            if not self._buffer:
+                if self.last is not None:
+                    return self.last
+                raise CDPError('Timed out waiting for a screencast frame')
+            entry = self._buffer[-1]
+            self._buffer.clear()
+            self._count(entry[0])
+        if self.last is None or self.last.frame_id != entry[0]:
+            self.last = self._decode(entry)
+        return self.last
+
+    def frames(self):
+        """All buffered frames, oldest first, emptying the buffer."""
+        with self._cond:
+            entries = list(self._buffer)
+            self._buffer.clear()
+            if entries:
+                self._count(entries[-1][0], len(entries))
+        return [self._decode(entry) for entry in entries]
+
+    def _count(self, frame_id, taken=1):
+        self.dropped += frame_id - self._last_id - taken
+        self._last_id = frame_id
+
+    def _decode(self, entry):
+        frame_id, timestamp, data, metadata = entry
+        image = Image.open(io.BytesIO(base64.b64decode(data)))
+        if self.clip is not None:
+            # frames are in device pixels of the visible area below offsetTop
+            scale = image.width / (metadata.get('deviceWidth') or image.width)
+            left, top, width, height = self.clip
+            top += metadata.get('offsetTop', 0)
+            image = image.crop((round(left * scale), round(top * scale),
+                                round((left + width) * scale), round((top + height) * scale)))
+        if self.size is not None and image.size != tuple(self.size):
+            image = image.resize(tuple(self.size), Image.BILINEAR)
+        image = rgba2rgb(image) if image.mode == 'RGBA' else image.convert('RGB')
+        return Frame(frame_id, timestamp, np.array(image))
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""JavaScript snippets executed inside the game page.
+
+The snippets are function bodies for `driver.execute_script`, so they take
+their parameters from `arguments`. Helper functions are defined inline to
+keep every call self-contained in a single round trip.
+"""
+
+import json
+
+from gym_chrome_dino.game.state import EMPTY_OBSTACLE, OBSTACLE_TYPES
+
+# Collects the flat state list documented in gym_chrome_dino.game.state.
+STATE_FN = '''
+function __dinoState(n) {
+    var r = Runner.instance_, t = r.tRex, obs = r.horizon.obstacles;
+    var s = [t.xPos, t.yPos, r.currentSpeed, r.crashed ? 1 : 0, r.playing ? 1 : 0,
+             parseInt(r.distanceMeter.digits.join(''), 10) || 0, Math.min(obs.length, n),
+             t.jumping ? 1 : 0, t.ducking ? 1 : 0, r.inverted ? 1 : 0];
+    for (var i = 0; i < n; i++) {
+        var o = obs[i];
+        if (o) {
+            s.push(%(types)s.indexOf(o.typeConfig.type) + 1, o.xPos, o.yPos,
+                   o.width, o.typeConfig.height, o.speedOffset || 0);
+        } else {
+            s.push(%(empty)s);
+        }
+    }
+    return s;
+}
+''' % {
+    'types': json.dumps(OBSTACLE_TYPES),
+    'empty': ', '.join(str(v) for v in EMPTY_OBSTACLE),
+}
+
+GET_STATE = STATE_FN + 'return __dinoState(arguments[0]);'
+
+# Feeds a synthetic key press (keydown followed by keyup) straight into the
+# Runner, which is what send_keys ends up doing without the element lookup.
+KEY_FN = '''
+function __dinoKey(code) {
+    if (!code) return;
+    var r = Runner.instance_;
+    var e = {keyCode: code, type: 'keydown', target: document.body, preventDefault: function() {}};
+    r.onKeyDown(e);
+    e.type = 'keyup';
+    r.onKeyUp(e);
+}
+'''
+
+CANVAS_FN = '''
+function __dinoCanvas() {
+    return document.getElementsByClassName('runner-canvas')[0].toDataURL().substring(22);
+}
+'''
+
+PRESS_KEY = KEY_FN + '__dinoKey(arguments[0]);'
+
+GET_CANVAS = CANVAS_FN + 'return __dinoCanvas();'
+
+
+# Ships raw RGBA bytes from getImageData, base64 encoded in chunks since
+# String.fromCharCode cannot take the whole frame at once.
+PIXELS_FN = '''
+function __dinoB64(d) {
+    var s = '';
+    for (var i = 0; i < d.length; i += 0x8000) {
+        s += String.fromCharCode.apply(null, d.subarray(i, i + 0x8000));
+    }
+    return btoa(s);
+}
+function __dinoPixels() {
+    var c = document.getElementsByClassName('runner-canvas')[0];
+    var d = c.getContext('2d').getImageData(0, 0, c.width, c.height).data;
+    return [c.width, c.height, __dinoB64(d)];
+}
+'''
+
+GET_PIXELS = PIXELS_FN + 'return __dinoPixels();'
+
+# Crops, downscales and grayscales the canvas on an offscreen canvas so only
+# the small single-channel frame crosses the driver. The weights are the
+# ones cv2.COLOR_RGB2GRAY uses, drawn over white like rgba2rgb.
+GRAY_FN = '''
+function __dinoGray(w, h, crop) {
+    var c = document.getElementsByClassName('runner-canvas')[0];
+    var o = window.__dinoOffscreen;
+    if (!o || o.width != w || o.height != h) {
+        o = window.__dinoOffscreen = typeof OffscreenCanvas != 'undefined' ?
+            new OffscreenCanvas(w, h) : document.createElement('canvas');
+        o.width = w;
+        o.height = h;
+    }
+    var ctx = o.getContext('2d');
+    ctx.imageSmoothingEnabled = true;
+    ctx.imageSmoothingQuality = 'high';
+    ctx.fillStyle = '#fff';
+    ctx.fillRect(0, 0, w, h);
+    crop = crop || [0, 0, c.width, c.height];
+    ctx.drawImage(c, crop[0], crop[1], crop[2], crop[3], 0, 0, w, h);
+    var d = ctx.getImageData(0, 0, w, h).data, g = new Uint8Array(w * h);
+    for (var i = 0, j = 0; j < g.length; i += 4, j++) {
+        g[j] = Math.round(0.299 * d[i] + 0.587 * d[i + 1] + 0.114 * d[i + 2]);
+    }
+    return __dinoB64(g);
+}
+'''
+
+GET_GRAY = PIXELS_FN + GRAY_FN + 'return __dinoGray(arguments[0], arguments[1], arguments[2]);'
+
+# Lock-step mode: the Runner loop is taken off requestAnimationFrame and
+# performance.now, so the page only moves when __dinoAdvance runs frames of
+# a fixed dt on a virtual clock. Arguments are (dt).
+LOCKSTEP_INSTALL = '''
+if (!window.__dinoClock) {
+    var r = Runner.instance_, clock = window.__dinoClock = {now: performance.now(), dt: arguments[0], callbacks: []};
+    if (r.raqId) {
+        cancelAnimationFrame(r.raqId);
+        clock.callbacks.push(r.update.bind(r));
+    }
+    performance.now = function() { return clock.now; };
+    window.requestAnimationFrame = function(callback) { return clock.callbacks.push(callback); };
+    window.cancelAnimationFrame = function() { clock.callbacks = []; };
+}
+'''
+
+ADVANCE_FN = '''
+function __dinoAdvance(k) {
+    var clock = window.__dinoClock;
+    if (!clock) return;
+    for (var i = 0; i < k; i++) {
+        clock.now += clock.dt;
+        var callbacks = clock.callbacks;
+        clock.callbacks = [];
+        for (var j = 0; j < callbacks.length; j++) callbacks[j](clock.now);
+    }
+}
+'''
+
+ADVANCE = ADVANCE_FN + '__dinoAdvance(arguments[0]);'
+
+# Finishes the start-up jump and the intro on the virtual clock instead of
+# waiting for the wall-clock CSS animation of the intro to end.
+START_FN = '''
+function __dinoStart() {
+    var r = Runner.instance_;
+    if (!r.activated) __dinoKey(32);
+    for (var i = 0; i < 600 && !r.activated; i++) __dinoAdvance(1);
+    if (r.playingIntro) r.startGame();
+}
+'''
+
+LOCKSTEP_START = KEY_FN + ADVANCE_FN + START_FN + '__dinoStart();'
+
+# restart() is a no-op while a frame is scheduled, i.e. until the game is over
+LOCKSTEP_RESTART = 'Runner.instance_.stop(); Runner.instance_.restart();'
+
+# Replaces Math.random with a seeded mulberry32 generator. Arguments are (seed).
+SEED_FN = '''
+function __dinoSeed(seed) {
+    window.__dinoRandom = {state: seed >>> 0};
+    Math.random = function() {
+        var r = window.__dinoRandom, t = r.state = (r.state + 0x6D2B79F5) >>> 0;
+        t = Math.imul(t ^ t >>> 15, t | 1);
+        t ^= t + Math.imul(t ^ t >>> 7, t | 61);
+        return ((t ^ t >>> 14) >>> 0) / 4294967296;
+    };
+}
+'''
+
+# the history of recent obstacle types is cleared too, it restricts the next draws
+SEED_RANDOM = SEED_FN + '__dinoSeed(arguments[0]); Runner.instance_.horizon.obstacleHistory = [];'
+
+# Snapshot of the dynamic game state: the plain (number, boolean, string and
+# flat array) fields of the Runner, Trex, DistanceMeter, Horizon, its
+# HorizonLine and NightMode, every obstacle and the seeded generator. Clouds
+# and stars are only drawn and are left out.
+SAVE_STATE = '''
+function plain(o, skip) {
+    var s = {};
+    if (!o) return null;
+    for (var k in o) {
+        if (!o.hasOwnProperty(k) || (skip && skip.indexOf(k) >= 0)) continue;
+        var v = o[k], t = typeof v;
+        if (v === null || t == 'number' || t == 'boolean' || t == 'string') {
+            s[k] = v;
+        } else if (Array.isArray(v) && v.every(function(x) {
+            var u = typeof x; return u == 'number' || u == 'boolean' || u == 'string';
+        })) {
+            s[k] = v.slice();
+        }
+    }
+    return s;
+}
+var r = Runner.instance_, h = r.horizon;
+return {
+    runner: plain(r, ['raqId', 'time', 'updatePending', 'resizeTimerId_']),
+    tRex: plain(r.tRex),
+    distanceMeter: plain(r.distanceMeter),
+    horizon: plain(h),
+    horizonLine: plain(h.horizonLine),
+    nightMode: plain(h.nightMode),
+    obstacles: h.obstacles.map(function(o) {
+        var s = plain(o);
+        s.type = o.typeConfig.type;
+        s.collisionBoxes = o.collisionBoxes.map(function(b) { return [b.x, b.y, b.width, b.height]; });
+        return s;
+    }),
+    random: window.__dinoRandom ? window.__dinoRandom.state : null
+};
+'''
+
+# Restores a SAVE_STATE snapshot into a started game and reschedules the
+# game loop (on the virtual clock in lock-step mode). Arguments are (snapshot).
+LOAD_STATE = SEED_FN + '''
+var s = arguments[0], r = Runner.instance_, h = r.horizon;
+if (r.raqId) cancelAnimationFrame(r.raqId);
+Object.assign(r, s.runner);
+Object.assign(r.tRex, s.tRex);
+Object.assign(r.distanceMeter, s.distanceMeter);
+Object.assign(h, s.horizon);
+if (h.horizonLine && s.horizonLine) Object.assign(h.horizonLine, s.horizonLine);
+if (h.nightMode && s.nightMode) Object.assign(h.nightMode, s.nightMode);
+h.obstacles = s.obstacles.map(function(o) {
+    var obstacle = Object.create(Obstacle.prototype);
+    obstacle.canvasCtx = h.canvasCtx;
+    obstacle.spritePos = h.spritePos[o.type];
+    obstacle.dimensions = h.dimensions;
+    obstacle.typeConfig = Obstacle.types.filter(function(t) { return t.type == o.type; })[0];
+    Object.assign(obstacle, o);
+    delete obstacle.type;
+    obstacle.collisionBoxes = o.collisionBoxes.map(function(b) { return new CollisionBox(b[0], b[1], b[2], b[3]); });
+    return obstacle;
+});
+if (s.random !== null) __dinoSeed(s.random);
+r.time = performance.now();
+r.raqId = 0;
+r.updatePending = false;
+if (r.playing && !r.crashed) {
+    r.updatePending = true;
+    r.raqId = requestAnimationFrame(r.update.bind(r));
+}
+'''
+
+# Applies a key press and reads back the state (and optionally a frame) in
+# the same call: arguments are (keycode, n_obstacles, capture, width, height,
+# crop, frames, repeat), where capture is null, 'png', 'rgba' or 'gray' and
+# frames is the number of lock-step frames to advance after the key press.
+# The press and advance are repeated `repeat` times or until a crash; only
+# the last frame and the one before it are captured. Returns [state, frame,
+# previous frame or null, number of repeats done].
+FRAME_FN = '''
+function __dinoFrame(args) {
+    var capture = args[2];
+    if (capture == 'png') return __dinoCanvas();
+    if (capture == 'rgba') return __dinoPixels();
+    if (capture == 'gray') return __dinoGray(args[3], args[4], args[5]);
+    return null;
+}
+'''
+
+STEP = KEY_FN + ADVANCE_FN + STATE_FN + CANVAS_FN + PIXELS_FN + GRAY_FN + FRAME_FN + '''
+var repeat = arguments[7] || 1, previous = null, n = 0;
+while (n < repeat) {
+    __dinoKey(arguments[0]);
+    __dinoAdvance(arguments[6]);
+    n++;
+    if (Runner.instance_.crashed) break;
+    if (n == repeat - 1) previous = __dinoFrame(arguments);
+}
+return [__dinoState(arguments[1]), __dinoFrame(arguments), previous, n];
+'''
+
+# STEP in real time, as an asynchronous script: the key is pressed once per
+# animation frame and the result is passed to the callback (last argument)
+# after `repeat` frames or a crash.
+STEP_ASYNC = KEY_FN + STATE_FN + CANVAS_FN + PIXELS_FN + GRAY_FN + FRAME_FN + '''
+var args = arguments, callback = args[args.length - 1], repeat = args[7] || 1, previous = null, n = 0;
+(function tick() {
+    __dinoKey(args[0]);
+    n++;
+    // registered after the Runner's own update, so this runs once it is drawn
+    requestAnimationFrame(function() {
+        if (Runner.instance_.crashed || n >= repeat) {
+            callback([__dinoState(args[1]), __dinoFrame(args), previous, n]);
+            return;
+        }
+        if (n == repeat - 1) previous = __dinoFrame(args);
+        tick();
+    });
+})();
+'''
+
+# Position of the game canvas in the viewport (CSS pixels) and its size in
+# canvas pixels, used to cut it out of screencast frames.
+CANVAS_RECT = '''
+var c = document.getElementsByClassName('runner-canvas')[0], b = c.getBoundingClientRect();
+return [b.left, b.top, b.width, b.height, c.width, c.height];
+'''
+
+# Runs whole episodes in the page, one per policy, and returns [score, steps]
+# for each. A policy is a list of [weights, bias] layers over the 7 features
+# of ChromeDinoGAEnv, tanh between layers, and the argmax of the last layer
+# is the action (0 noop, 1 up, 2 down). Needs the lock-step clock. Arguments
+# are (policies, max_steps, frames_per_step, seed), seed may be null.
+EVALUATE = KEY_FN + ADVANCE_FN + START_FN + SEED_FN + '''
+function act(layers, x) {
+    for (var l = 0; l < layers.length; l++) {
+        var w = layers[l][0], b = layers[l][1], y = new Array(b.length);
+        for (var i = 0; i < b.length; i++) {
+            var s = b[i], row = w[i];
+            for (var j = 0; j < x.length; j++) s += row[j] * x[j];
+            y[i] = l + 1 < layers.length ? Math.tanh(s) : s;
+        }
+        x = y;
+    }
+    var best = 0;
+    for (var k = 1; k < x.length; k++) if (x[k] > x[best]) best = k;
+    return best;
+}
+var policies = arguments[0], maxSteps = arguments[1], frames = arguments[2], seed = arguments[3];
+var r = Runner.instance_, keys = [0, 38, 40], out = [];
+__dinoStart();  // so all episodes start alike
+for (var p = 0; p < policies.length; p++) {
+    if (seed !== null) __dinoSeed(seed);
+    r.stop();
+    r.restart();
+    if (seed !== null) r.horizon.obstacleHistory = [];
+    var steps = 0;
+    while (steps < maxSteps && !r.crashed) {
+        var t = r.tRex, o = r.horizon.obstacles[0];
+        var ox = o ? o.xPos : 600, oy = o ? o.yPos : 150;
+        var x = [ox - t.xPos, oy - t.yPos, t.xPos, t.yPos,
+                 o ? o.typeConfig.width : 0, o ? o.typeConfig.height : 0, r.currentSpeed];
+        __dinoKey(keys[act(policies[p], x)]);
+        __dinoAdvance(frames);
+        steps++;
+    }
+    out.push([parseInt(r.distanceMeter.digits.join(''), 10) || 0, steps]);
+}
+return out;
+'''
+
+# Host page scripts (gym_chrome_dino.game.dino_host). Game scripts are
+# compiled with the Function constructor of the iframe, so `Runner`,
+# `document` and `window` resolve to the globals of that game instance.
+HOST_SETUP = '''
+var n = arguments[0], url = location.href;
+if (window.Runner && Runner.instance_) Runner.instance_.stop();
+document.body.innerHTML = '';
+for (var i = 0; i < n; i++) {
+    var f = document.createElement('iframe');
+    f.src = url;
+    f.width = 620;
+    f.height = 170;
+    f.style.border = '0';
+    document.body.appendChild(f);
+}
+'''
+
+HOST_READY = '''
+var frames = document.getElementsByTagName('iframe'), ready = 0;
+for (var i = 0; i < frames.length; i++) {
+    try {
+        var w = frames[i].contentWindow;
+        if (w.Runner && w.Runner.instance_) ready++;
+    } catch (e) {}
+}
+return ready;
+'''
+
+HOST_EXECUTE = '''
+var w = document.getElementsByTagName('iframe')[arguments[0]].contentWindow;
+return new w.Function(arguments[1]).apply(null, arguments[2]);
+'''
+
+HOST_EXECUTE_ASYNC = '''
+var w = document.getElementsByTagName('iframe')[arguments[0]].contentWindow;
+new w.Function(arguments[1]).apply(null, arguments[2].concat([arguments[arguments.length - 1]]));
+'''
+
+# Runs one script in several instances: arguments are (script, indices, args
+# per instance).
+HOST_EXECUTE_ALL = '''
+var frames = document.getElementsByTagName('iframe'), indices = arguments[1], out = [];
+for (var i = 0; i < indices.length; i++) {
+    var w = frames[indices[i]].contentWindow;
+    out.push(new w.Function(arguments[0]).apply(null, arguments[2][i]));
+}
+return out;
+'''
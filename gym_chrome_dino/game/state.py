@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import functools
+import numpy as np
+
+# Obstacle type ids used in the state snapshot, 0 marks an empty slot.
+OBSTACLE_TYPES = ['CACTUS_SMALL', 'CACTUS_LARGE', 'PTERODACTYL']
+
+# Values of an empty obstacle slot, same as the defaults of the old getters.
+EMPTY_OBSTACLE = (0, 600., 150., 0., 0., 0.)
+
+# The width of one cactus or pterodactyl by type id. The state records the
+# width of the whole obstacle, a group of up to three cacti.
+OBSTACLE_TYPE_WIDTHS = np.array([0., 17., 25., 46.], dtype=np.float32)
+
+OBSTACLE_FIELDS = ['type', 'x', 'y', 'width', 'height', 'speed_offset']
+STATE_FIELDS = ['dino_x', 'dino_y', 'speed', 'crashed', 'playing', 'score', 'num_obstacles', 'jumping', 'ducking',
+                'inverted']
+
+OBSTACLE_DTYPE = np.dtype([
+    ('type', np.int8),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('width', np.float32),
+    ('height', np.float32),
+    ('speed_offset', np.float32),  # pterodactyls fly faster or slower than the ground moves
+])
+
+
+@functools.lru_cache(maxsize=None)
+def state_dtype(n_obstacles):
+    return np.dtype([
+        ('dino_x', np.float32),
+        ('dino_y', np.float32),
+        ('speed', np.float32),
+        ('crashed', np.bool_),
+        ('playing', np.bool_),
+        ('score', np.int32),
+        ('num_obstacles', np.int8),
+        ('jumping', np.bool_),
+        ('ducking', np.bool_),
+        ('inverted', np.bool_),
+        ('obstacles', OBSTACLE_DTYPE, (n_obstacles,)),
+    ])
+
+
+def unpack_state(values, n_obstacles, out=None):
+    """Fill a state record from the flat list returned by the state script.
+
+    The layout is STATE_FIELDS followed by n_obstacles groups of
+    OBSTACLE_FIELDS.
+    """
+    k, m = len(STATE_FIELDS), len(OBSTACLE_FIELDS)
+    record = tuple(values[:k]) + ([tuple(values[k + m * i:k + m * (i + 1)]) for i in range(n_obstacles)],)
+    if out is None:
+        return np.array(record, dtype=state_dtype(n_obstacles))
+    out[()] = record
+    return out
+
+
+def ga_observation(state, out=None):
+    """Build the 7-feature ChromeDinoGAEnv observation from a state record."""
+    if out is None:
+        out = np.empty(7, dtype=np.float32)
+    nearest = state['obstacles'][0]
+    out[0] = nearest['x'] - state['dino_x']
+    out[1] = nearest['y'] - state['dino_y']
+    out[2] = state['dino_x']
+    out[3] = state['dino_y']
+    out[4] = OBSTACLE_TYPE_WIDTHS[nearest['type']]  # like the old getter, typeConfig.width
+    out[5] = nearest['height']
+    out[6] = state['speed']
+    return out
+
+
+# Bounds of the structured_observation features: dino y, speed, jumping,
+# ducking and inverted, then per obstacle its type id, x and y relative to
+# the dino, width, height and speed. An obstacle is dropped once it has
+# passed x = -width; the widest is three large cacti (3 * 25) and the dino
+# runs at x = 50.
+DINO_LOW = [0., 0., 0., 0., 0.]
+DINO_HIGH = [150., 100., 1., 1., 1.]
+OBSTACLE_LOW = [0., -(3 * 25 + 50.), -150., 0., 0., 0.]
+OBSTACLE_HIGH = [len(OBSTACLE_TYPES), 650., 150., 200., 100., 100.]
+
+
+@functools.lru_cache(maxsize=None)
+def structured_bounds(n_obstacles):
+    """(low, high) read-only float32 arrays of structured_observation."""
+    low = np.array(DINO_LOW + OBSTACLE_LOW * n_obstacles, dtype=np.float32)
+    high = np.array(DINO_HIGH + OBSTACLE_HIGH * n_obstacles, dtype=np.float32)
+    low.flags.writeable = high.flags.writeable = False
+    return low, high
+
+
+def structured_observation(state, out=None, normalize=False):
+    """Fixed-size float32 features of the dino and every obstacle slot.
+
+    Empty slots have type 0 and the EMPTY_OBSTACLE position. Features are
+    clipped to structured_bounds, and with `normalize` scaled to [0, 1].
+    """
+    obstacles = state['obstacles']
+    n = len(obstacles)
+    if out is None:
+        out = np.empty(len(DINO_LOW) + len(OBSTACLE_LOW) * n, dtype=np.float32)
+    out[0] = state['dino_y']
+    out[1] = state['speed']
+    out[2] = state['jumping']
+    out[3] = state['ducking']
+    out[4] = state['inverted']
+    o = out[len(DINO_LOW):].reshape(n, len(OBSTACLE_LOW))
+    o[:, 0] = obstacles['type']
+    o[:, 1] = obstacles['x'] - state['dino_x']
+    o[:, 2] = obstacles['y'] - state['dino_y']
+    o[:, 3] = obstacles['width']
+    o[:, 4] = obstacles['height']
+    o[:, 5] = np.where(obstacles['type'] > 0, state['speed'] + obstacles['speed_offset'], 0.)
+    low, high = structured_bounds(n)
+    np.clip(out, low, high, out=out)
+    if normalize:
+        out -= low
+        out /= high - low
+    return out
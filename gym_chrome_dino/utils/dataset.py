@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Shuffled minibatches of transitions from recorded episodes.
+
+Only the step records are loaded into memory; frames are read from the
+memory-mapped episode files (see gym_chrome_dino.utils.recording) when a
+batch is built. Batches are built on a thread pool ahead of use.
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from gym_chrome_dino.utils.recording import EpisodeReader
+
+Batch = collections.namedtuple('Batch', ['observations', 'actions', 'returns', 'next_observations', 'dones',
+                                         'discounts'])
+
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)  # cv2.COLOR_RGB2GRAY
+
+
+def area_matrix(size_in, size_out):
+    """(size_out, size_in) weights of an area (box) resize along one axis."""
+    scale = size_in / size_out
+    m = np.zeros((size_out, size_in), dtype=np.float32)
+    for j in range(size_out):
+        start, end = j * scale, (j + 1) * scale
+        for i in range(int(start), min(int(np.ceil(end)), size_in)):
+            m[j, i] = min(end, i + 1) - max(start, i)
+    return m / scale
+
+
+def warp_frames(frames, width=160, height=80, chunk=64):
+    """Batched WarpFrame: (B, H, W, 3) RGB to (B, height, width) gray uint8.
+
+    Equal to cv2's RGB2GRAY and INTER_AREA up to rounding. Frames are
+    converted to float `chunk` at a time to bound the scratch memory.
+    """
+    rows = area_matrix(frames.shape[1], height)
+    cols = area_matrix(frames.shape[2], width).T.copy()
+    out = np.empty((len(frames), height, width), dtype=np.uint8)
+    for i in range(0, len(frames), chunk):
+        gray = frames[i:i + chunk].astype(np.float32) @ GRAY_WEIGHTS
+        np.clip(np.rint(rows @ (gray @ cols)), 0, 255, out=out[i:i + chunk], casting='unsafe')
+    return out
+
+
+class TrajectoryDataset():
+    """Iterates over shuffled transitions of the episodes in `directory`.
+
+    Observations are stacks of the last `frame_stack` frames, (B, H, W, k)
+    like FrameStack, with frames before the episode start repeating its
+    first frame. RGB frames are warped to gray `frame_size` like make_dino
+    unless `warp` is False. Rewards are summed over `n_step` steps with
+    `gamma`; `discounts` is gamma ** n for the bootstrap, 0 after a done.
+    Each iteration is one epoch.
+    """
+
+    def __init__(self, directory, batch_size=32, frame_stack=4, n_step=1, gamma=0.99, warp=True,
+                 frame_size=(160, 80), shuffle=True, drop_last=True, prefetch=4, num_workers=2, seed=None):
+        self.episodes = list(EpisodeReader(directory))
+        self.batch_size = batch_size
+        self.frame_stack = frame_stack
+        self.n_step = n_step
+        self.gamma = gamma
+        self.frame_size = tuple(frame_size)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+        self.num_workers = num_workers
+        self.rng = np.random.RandomState(seed)
+
+        frame_shape = self.episodes[0].frames.shape[1:]
+        self.warp = warp and len(frame_shape) == 3 and frame_shape[2] == 3
+
+        # step records of all episodes, with frame indices made global
+        lengths = np.array([len(e) for e in self.episodes])
+        n_frames = np.array([len(e.frames) for e in self.episodes])
+        self.frame_offsets = np.concatenate([[0], np.cumsum(n_frames)])
+        steps = [e.steps for e in self.episodes]
+        self.frames = np.concatenate([s['frame'] + o for s, o in zip(steps, self.frame_offsets)])
+        self.actions = np.concatenate([s['action'] for s in steps])
+        self.rewards = np.concatenate([s['reward'] for s in steps])
+        self.dones = np.concatenate([s['done'] for s in steps])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        self.episode_start = np.repeat(starts, lengths)
+        self.episode_end = np.repeat(starts + lengths - 1, lengths)
+        # a transition starts at every step that has a next step in its episode
+        self.indices = np.flatnonzero(np.arange(len(self.frames)) < self.episode_end)
+
+    def __len__(self):
+        n = len(self.indices) // self.batch_size
+        if not self.drop_last and len(self.indices) % self.batch_size:
+            n += 1
+        return n
+
+    def __iter__(self):
+        order = self.rng.permutation(self.indices) if self.shuffle else self.indices
+        batches = [order[i:i + self.batch_size] for i in range(0, len(self) * self.batch_size, self.batch_size)]
+        with ThreadPoolExecutor(self.num_workers) as pool:
+            pending = collections.deque()
+            for t in batches:
+                pending.append(pool.submit(self.batch, t))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def sample(self, batch_size=None):
+        """One batch of random transitions."""
+        return self.batch(self.rng.choice(self.indices, batch_size or self.batch_size))
+
+    def batch(self, t):
+        """Builds the batch of the transitions starting at global steps `t`."""
+        t = np.asarray(t)
+        # the action taken on observation t is stored with step t + 1
+        j = t[:, None] + 1 + np.arange(self.n_step)
+        valid = j <= self.episode_end[t][:, None]
+        j = np.minimum(j, self.episode_end[t][:, None])
+        done = self.dones[j] & valid
+        alive = valid & (np.cumsum(done, axis=1) - done == 0)  # no done before this step
+        taken = alive.sum(axis=1)
+        returns = (self.rewards[j] * alive * self.gamma ** np.arange(self.n_step)).sum(axis=1)
+        dones = (done & alive).any(axis=1)
+        discounts = np.where(dones, 0., self.gamma ** taken).astype(np.float32)
+
+        window = np.arange(self.frame_stack - 1, -1, -1)
+        start = self.episode_start[t][:, None]
+        ids = self.frames[np.concatenate([np.maximum(t[:, None] - window, start),
+                                          np.maximum((t + taken)[:, None] - window, start)])]
+        stacks = self._load_frames(ids)
+        return Batch(stacks[:len(t)], self.actions[t + 1], returns.astype(np.float32), stacks[len(t):], dones,
+                     discounts)
+
+    def _load_frames(self, ids):
+        # every frame needed by the batch is read and warped once
+        unique, inverse = np.unique(ids, return_inverse=True)
+        episode = np.searchsorted(self.frame_offsets, unique, side='right') - 1
+        frames = None
+        for e in np.unique(episode):
+            mask = episode == e
+            data = self.episodes[e].frames[unique[mask] - self.frame_offsets[e]]
+            if frames is None:
+                frames = np.empty((len(unique),) + data.shape[1:], dtype=data.dtype)
+            frames[mask] = data
+        if self.warp:
+            frames = warp_frames(frames, *self.frame_size)
+        elif frames.ndim == 4 and frames.shape[3] == 1:
+            frames = frames[..., 0]
+        stacks = frames[inverse.reshape(ids.shape)]  # (B, k, ...)
+        return np.moveaxis(stacks, 1, -1)
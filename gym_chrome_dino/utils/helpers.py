@@ -4,11 +4,31 @@
 # Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
+import collections
+import os
+import signal
+import time
+
 def rgba2rgb(im):
     from PIL import Image
     bg = Image.new("RGB", im.size, (255, 255, 255))  # fill background as white color
     bg.paste(im, mask=im.split()[3])  # 3 is the alpha channel
     return bg
+
+def rgba2rgb_array(rgba, out=None, scratch=None):
+    # vectorized rgba2rgb for an (h, w, 4) uint8 array: out = 255 - (255 - rgb) * alpha / 255
+    import numpy as np
+    h, w = rgba.shape[:2]
+    if out is None:
+        out = np.empty((h, w, 3), dtype=np.uint8)
+    if scratch is None:
+        scratch = np.empty((h, w, 3), dtype=np.uint16)
+    np.subtract(255, rgba[..., :3], out=scratch, dtype=np.uint16)
+    np.multiply(scratch, rgba[..., 3:], out=scratch)
+    scratch += 127
+    scratch //= 255
+    np.subtract(255, scratch, out=out, casting='unsafe')
+    return out
     
 def download_file(url):
     import requests
@@ -59,7 +79,6 @@ def download_chromedriver():
     st = os.stat(extracted[0])
     os.chmod(extracted[0], st.st_mode | stat.S_IEXEC)
 
-import time
 class Timer():
     def __init__(self):
         self.t0 = time.time()
@@ -67,4 +86,47 @@ class Timer():
         t1 = time.time()
         dt = t1 - self.t0
         self.t0 = t1
-        return dt
\ No newline at end of file
+        return dt
+
+
+def _descendants(pid):
+    children = collections.defaultdict(list)
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(entry)) as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children[ppid].append(int(entry))
+    stack, out = [pid], []
+    while stack:
+        p = stack.pop()
+        out.append(p)
+        stack.extend(children[p])
+    return out
+
+
+def process_tree_rss(pid=None):
+    """RSS in bytes of a process (this one by default) and its children, None if unknown."""
+    if not os.path.exists('/proc/self/statm'):
+        return None
+    page = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for p in _descendants(os.getpid() if pid is None else pid):
+        try:
+            with open('/proc/{}/statm'.format(p)) as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+def kill_process_tree(pid):
+    """Kill a process and, where /proc is available, all its descendants."""
+    pids = _descendants(pid) if os.path.exists('/proc/self/stat') else [pid]
+    for p in pids:  # listed before killing, the children of a killed process are reparented
+        try:
+            os.kill(p, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        except OSError:
+            pass
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Opt-in timing of the stages of a step.
+
+The game, envs and wrappers time their stages with `PROFILER.stage(name)`,
+which costs a single attribute check while profiling is disabled. Once
+enabled (with `enable()` or GYM_CHROME_DINO_PROFILE=1), every stage feeds
+a log2 histogram, the envs put the timings of the current step in
+info['timings'], and with trace=True the spans are kept for a Chrome
+trace-event file (chrome://tracing, Perfetto).
+"""
+
+import collections
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+N_BUCKETS = 32  # bucket i holds durations in [2 ** (i - 1), 2 ** i) microseconds
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class Histogram():
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = math.inf
+        self.max = 0.
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[min(int(seconds * 1e6).bit_length(), N_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, in seconds."""
+        target, seen = q / 100 * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.,
+            'min': self.min if self.count else 0.,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class _Stage():
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+
+
+class Profiler():
+    def __init__(self, enabled=False, trace=False, trace_size=1000000):
+        self.enabled = enabled
+        self.tracing = trace
+        self.histograms = collections.defaultdict(Histogram)
+        self.events = collections.deque(maxlen=trace_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self, trace=False):
+        self.tracing = trace
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+
+    def stage(self, name):
+        """Context manager timing one stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, start, end):
+        seconds = end - start
+        timings = getattr(self._local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.) + seconds
+        with self._lock:
+            self.histograms[name].add(seconds)
+            if self.tracing:
+                self.events.append((name, start, seconds, threading.get_ident()))
+
+    def begin_step(self):
+        """Start collecting the stage times of a step on this thread.
+
+        Returns the dict they are summed into (None while disabled); stages
+        timed by outer wrappers after the env returns land there as well.
+        """
+        if not self.enabled:
+            self._local.timings = None
+            return None
+        self._local.timings = {}
+        return self._local.timings
+
+    def summary(self):
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def report(self):
+        """The summary as a text table, times in milliseconds."""
+        lines = ['{:<24}{:>10}{:>12}{:>10}{:>10}{:>10}{:>10}'.format(
+            'stage', 'count', 'total', 'mean', 'p50', 'p90', 'p99')]
+        for name, s in self.summary().items():
+            lines.append('{:<24}{:>10}{:>12.1f}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}'.format(
+                name, s['count'], s['total'] * 1e3, s['mean'] * 1e3, s['p50'] * 1e3, s['p90'] * 1e3,
+                s['p99'] * 1e3))
+        return '\n'.join(lines)
+
+    def dump_trace(self, path):
+        """Write the recorded spans as Chrome trace-event JSON."""
+        pid = os.getpid()
+        with self._lock:
+            events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'ts': start * 1e6,
+                       'dur': seconds * 1e6, 'pid': pid, 'tid': tid}
+                      for name, start, seconds, tid in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+PROFILER = Profiler(enabled=bool(os.environ.get('GYM_CHROME_DINO_PROFILE')))
+
+enable = PROFILER.enable
+disable = PROFILER.disable
+reset = PROFILER.reset
+summary = PROFILER.summary
+report = PROFILER.report
+dump_trace = PROFILER.dump_trace
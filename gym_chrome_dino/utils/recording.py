@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+"""Episode recording to append-only raw files that are read back with mmap.
+
+A recording directory holds one pair of segments per episode plus an
+index:
+
+    episode_000000.frames   unique observations, raw (n, *frame_shape)
+    episode_000000.steps    one structured record per step, raw
+    index.json              shapes, dtypes and lengths of every episode
+
+A step record has the index of its frame, the action, reward, done flag
+and, when given, the game state record. A frame equal to the previous one
+is not written again; its step points to the earlier frame. The reset
+observation is step 0 with action -1.
+
+Segments are created exclusively, skipping names already on disk, so the
+leftovers of a crashed recorder or the episodes of another recorder in the
+same directory are never appended to. The index is re-read and merged when
+it is written.
+
+Frames and steps are handed to a writer thread through a bounded queue
+and written in chunks, so the env loop only pays for a copy of the frame
+(and blocks only when the writer is `max_pending` items behind).
+"""
+
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+INDEX = 'index.json'
+
+
+def step_dtype(state_dtype=None):
+    fields = [('frame', np.int64), ('action', np.int32), ('reward', np.float32), ('done', np.bool_)]
+    if state_dtype is not None:
+        fields.append(('state', state_dtype))
+    return np.dtype(fields)
+
+
+def _copy(state):
+    return np.array(state) if state is not None else None
+
+
+def _create_segments(directory, number):
+    # the first free episode name from `number` on, with both of its files opened exclusively
+    while True:
+        name = 'episode_{:06d}'.format(number)
+        number += 1
+        try:
+            frames_file = open(os.path.join(directory, name + '.frames'), 'xb')
+        except FileExistsError:
+            continue
+        try:
+            steps_file = open(os.path.join(directory, name + '.steps'), 'xb')
+        except FileExistsError:
+            frames_file.close()
+            os.remove(frames_file.name)
+            continue
+        return name, frames_file, steps_file
+
+
+class _EpisodeWriter():
+    def __init__(self, directory, number, frame, state_dtype, chunk_size):
+        self.name, self.frames_file, self.steps_file = _create_segments(directory, number)
+        self.frame_shape = frame.shape
+        self.frame_dtype = frame.dtype
+        self.dtype = step_dtype(state_dtype)
+        self.chunk_size = chunk_size
+        self.steps = np.zeros(chunk_size, dtype=self.dtype)
+        self.n_steps = self.n_frames = 0
+        self.pending_frames = []
+        self.pending_steps = 0
+        self.last_frame = None
+
+    def add(self, frame, action, reward, done, state):
+        if self.last_frame is None or not np.array_equal(frame, self.last_frame):
+            self.pending_frames.append(frame)
+            self.n_frames += 1
+            self.last_frame = frame
+        record = self.steps[self.pending_steps]
+        record['frame'] = self.n_frames - 1
+        record['action'] = action
+        record['reward'] = reward
+        record['done'] = done
+        if state is not None:
+            record['state'] = state
+        self.pending_steps += 1
+        self.n_steps += 1
+        if self.pending_steps == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for frame in self.pending_frames:
+            self.frames_file.write(frame.tobytes())
+        self.steps_file.write(self.steps[:self.pending_steps].tobytes())
+        self.pending_frames = []
+        self.pending_steps = 0
+
+    def close(self):
+        self.flush()
+        self.frames_file.close()
+        self.steps_file.close()
+        return {
+            'name': self.name,
+            'steps': self.n_steps,
+            'frames': self.n_frames,
+            'frame_shape': list(self.frame_shape),
+            'frame_dtype': self.frame_dtype.str,
+            'step_dtype': self.dtype.descr,
+        }
+
+
+class EpisodeRecorder():
+    """Records episodes into `directory` from a background writer thread.
+
+    Call `begin(observation, state)` after reset, `add(observation, action,
+    reward, done, state)` after every step and `end()` when the episode is
+    over; `close()` flushes everything and stops the thread.
+    """
+
+    def __init__(self, directory, chunk_size=256, max_pending=1024):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.episodes = self._read_index()
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._recording = False
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    @property
+    def recording(self):
+        return self._recording
+
+    def _put(self, item):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def begin(self, observation, state=None):
+        if self._recording:
+            self.end()
+        self._recording = True
+        self._put(('begin', np.array(observation), _copy(state)))
+
+    def add(self, observation, action, reward, done, state=None):
+        self._put(('add', (np.array(observation), action, reward, done, _copy(state)), None))
+
+    def end(self):
+        if self._recording:
+            self._recording = False
+            self._put(('end', None, None))
+
+    def flush(self):
+        """Block until every queued item is written."""
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self.end()
+        self._put(('close', None, None))
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write(self):
+        writer = None
+        while True:
+            item = self._queue.get()
+            try:
+                if self._error is None:
+                    writer = self._handle(writer, item)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+            if item[0] == 'close':
+                return
+
+    def _handle(self, writer, item):
+        kind, data, state = item
+        if kind == 'begin':
+            state_dtype = state.dtype if state is not None else None
+            writer = _EpisodeWriter(self.directory, len(self.episodes), data, state_dtype, self.chunk_size)
+            writer.add(data, -1, 0., False, state)
+        elif kind == 'add':
+            writer.add(*data)
+        elif kind == 'end' and writer is not None:
+            self._write_index(writer.close())
+            writer = None
+        return writer
+
+    def _read_index(self):
+        path = os.path.join(self.directory, INDEX)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)['episodes']
+
+    def _write_index(self, entry):
+        # other recorders may have added episodes since the index was read
+        names = set(e['name'] for e in self.episodes)
+        self.episodes += [e for e in self._read_index() if e['name'] not in names]
+        self.episodes.append(entry)
+        path = os.path.join(self.directory, INDEX)
+        tmp = '{}.{}-{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp, 'w') as f:
+            json.dump({'episodes': self.episodes}, f)
+        os.replace(tmp, path)
+
+
+class Episode():
+    """One recorded episode; `frames` and `steps` are read-only memmaps."""
+
+    def __init__(self, directory, entry):
+        self.name = entry['name']
+        self.dtype = np.dtype(_descr(entry['step_dtype']))
+        self.frames = self._map(os.path.join(directory, self.name + '.frames'), np.dtype(entry['frame_dtype']),
+                                (entry['frames'],) + tuple(entry['frame_shape']))
+        self.steps = self._map(os.path.join(directory, self.name + '.steps'), self.dtype, (entry['steps'],))
+
+    @staticmethod
+    def _map(path, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def observation(self, t):
+        """The observation of step t, a view into the frames file."""
+        return self.frames[self.steps['frame'][t]]
+
+    @property
+    def observations(self):
+        """All observations in step order (a copy, duplicates expanded)."""
+        return self.frames[self.steps['frame']]
+
+    @property
+    def actions(self):
+        return self.steps['action']
+
+    @property
+    def rewards(self):
+        return self.steps['reward']
+
+    @property
+    def dones(self):
+        return self.steps['done']
+
+
+def _descr(descr):
+    # json turns the tuples of a dtype descr into lists
+    if isinstance(descr, str):
+        return descr
+    fields = []
+    for field in descr:
+        name, dtype = field[0], _descr(field[1])
+        fields.append((name, dtype, tuple(field[2])) if len(field) > 2 else (name, dtype))
+    return fields
+
+
+class EpisodeReader():
+    """Memory-maps the episodes of a recording directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX)) as f:
+            self.entries = json.load(f)['episodes']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        return Episode(self.directory, self.entries[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import numpy as np
+
+
+class FrameReplayBuffer():
+    """Replay memory storing every frame once and stacking on sampling.
+
+    `add(frame, action, reward, done)` stores the newest (H, W) frame of the
+    observation the action was taken on, e.g. RingFrameStack.latest_frame().
+    Stacks of k frames are rebuilt by index; frames before the start of an
+    episode repeat its first frame, as FrameStack does after reset.
+    """
+
+    def __init__(self, capacity, frame_shape, k=4, channels_last=True, dtype=np.uint8):
+        self.capacity = capacity
+        self.k = k
+        self.channels_last = channels_last
+        self.frames = np.zeros((capacity,) + tuple(frame_shape[:2]), dtype=dtype)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.episode_starts = np.zeros(capacity, dtype=np.int64)  # absolute index of the episode start
+        self.total = 0
+        self._episode_start = 0
+        self._offsets = np.arange(k - 1, -1, -1)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def add(self, frame, action, reward, done):
+        i = self.total % self.capacity
+        self.frames[i] = frame.reshape(self.frames.shape[1:])
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.episode_starts[i] = self._episode_start
+        self.total += 1
+        if done:
+            self._episode_start = self.total
+
+    def stack(self, t):
+        """Frame stacks ending at the absolute indices `t`, shape (B, H, W, k)."""
+        t = np.asarray(t)
+        times = t[:, None] - self._offsets
+        times = np.maximum(times, self.episode_starts[t % self.capacity][:, None])
+        out = self.frames[times % self.capacity]
+        return out.transpose(0, 2, 3, 1) if self.channels_last else out
+
+    def sample(self, batch_size, rng=np.random):
+        """Returns (obs, actions, rewards, next_obs, dones) of random transitions."""
+        low = max(0, self.total - self.capacity + self.k - 1)
+        assert self.total - 1 > low, 'not enough transitions stored'
+        t = rng.randint(low, self.total - 1, size=batch_size)
+        i = t % self.capacity
+        return self.stack(t), self.actions[i], self.rewards[i], self.stack(t + 1), self.dones[i]
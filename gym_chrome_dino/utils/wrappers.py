@@ -4,14 +4,18 @@
 # Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
 # Licensed under the MIT License - https://opensource.org/licenses/MIT
 
+import time
+
 import cv2
 import numpy as np
 
 import gym
 from gym import spaces
 
+from gym_chrome_dino.game.dino_game import FPS
 from gym_chrome_dino.utils.atari_wrappers import FrameStack
 from gym_chrome_dino.utils.helpers import Timer
+from gym_chrome_dino.utils.profiling import PROFILER
 
 cv2.ocl.setUseOpenCL(False)
 
@@ -24,9 +28,10 @@ class WarpFrame(gym.ObservationWrapper):
             shape=(self.height, self.width, 1), dtype=np.uint8)
 
     def observation(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-        frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
-        return frame[:, :, None]
+        with PROFILER.stage('wrapper.warp_frame'):
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+            return frame[:, :, None]
 
 class TimerEnv(gym.Wrapper):
     def __init__(self, env):
@@ -43,10 +48,128 @@ class TimerEnv(gym.Wrapper):
         info['timedelta'] = self.timer.tick()
         return obs, reward, done, info
 
-def make_dino(env, timer=True, frame_stack=True):
-    env = WarpFrame(env, 160, 80)
+class PacedEnv(gym.Wrapper):
+    """Step at a fixed control rate, `fps` (by default the env's
+    video.frames_per_second), on a monotonic deadline clock.
+
+    A step is issued ahead of its deadline by the running mean of the env
+    step time, so its observation is captured while the remaining budget
+    runs out and is ready at the deadline. info['overrun'] is how late the
+    step was issued (0 when on time) and info['missed_ticks'] the number of
+    deadlines skipped instead of caught up. With `adaptive_skip` the env's
+    real-time frame_skip is set to the animation frames left in the period
+    after the agent's time and the step overhead, so a slower agent or
+    browser gets fewer game frames per step rather than a lower rate.
+    """
+
+    def __init__(self, env, fps=None, adaptive_skip=False, max_frame_skip=8, smoothing=0.1):
+        gym.Wrapper.__init__(self, env)
+        self.period = 1. / (fps or env.metadata.get('video.frames_per_second', 10))
+        self.adaptive_skip = adaptive_skip
+        if adaptive_skip:
+            assert not env.unwrapped.game.lockstep, 'adaptive_skip needs a real-time game'
+        self.max_frame_skip = max_frame_skip
+        self.smoothing = smoothing
+        self.latency = 0.  # running means, in seconds
+        self.agent_time = 0.
+        self.overhead = 0.
+        self.overruns = 0
+        self.deadline = self.returned = None
+
+    def _mean(self, mean, value):
+        return mean + self.smoothing * (value - mean)
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+        self.returned = time.perf_counter()
+        self.deadline = self.returned + self.period
+        return obs
+
+    def step(self, action):
+        now = time.perf_counter()
+        self.agent_time = self._mean(self.agent_time, now - self.returned)
+        if self.adaptive_skip:
+            skip = int((self.period - self.agent_time - self.overhead) * FPS)
+            self.env.unwrapped.frame_skip = skip = min(max(skip, 1), self.max_frame_skip)
+        issue = self.deadline - self.latency
+        if now < issue:
+            time.sleep(issue - now)
+            overrun = 0.
+        else:
+            overrun = now - issue
+            self.overruns += overrun > 0
+        start = time.perf_counter()
+        obs, reward, done, info = self.env.step(action)
+        self.returned = time.perf_counter()
+        latency = self.returned - start
+        self.latency = self._mean(self.latency, latency)
+        if self.adaptive_skip:
+            self.overhead = self._mean(self.overhead, max(latency - self.env.unwrapped.game.repeats / FPS, 0.))
+            info['frame_skip'] = skip
+        self.deadline += self.period
+        missed = 0
+        if self.deadline < self.returned:
+            missed = int((self.returned - self.deadline) / self.period) + 1
+            self.deadline += missed * self.period
+        info['overrun'] = overrun
+        info['missed_ticks'] = missed
+        info['step_latency'] = latency
+        return obs, reward, done, info
+
+class RingFrameStack(gym.Wrapper):
+    """Stack k last frames in a preallocated circular buffer.
+
+    Each frame is written once into a (k + spare, H, W) buffer and the
+    observation is a copy of k consecutive rows, transposed to (H, W, k)
+    when `channels_last` like FrameStack. With copy=False it is a view of
+    the buffer instead: when the write position reaches the end, the last
+    k - 1 frames are moved to the front, so a view stays valid for only
+    `spare` more steps. Store such frames in
+    gym_chrome_dino.utils.replay.FrameReplayBuffer rather than keeping views.
+    """
+
+    def __init__(self, env, k, spare=64, channels_last=True, copy=True):
+        gym.Wrapper.__init__(self, env)
+        self.k = k
+        self.channels_last = channels_last
+        self.copy = copy
+        shp = env.observation_space.shape
+        self.buffer = np.zeros((k + spare,) + shp[:2], dtype=env.observation_space.dtype)
+        self.pos = k - 1
+        shape = (shp[0], shp[1], k) if channels_last else (k, shp[0], shp[1])
+        self.observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=env.observation_space.dtype)
+
+    def reset(self, **kwargs):
+        ob = self.env.reset(**kwargs)
+        self.pos = self.k - 1
+        self.buffer[:self.k] = ob.reshape(self.buffer.shape[1:])
+        return self._get_ob()
+
+    def step(self, action):
+        ob, reward, done, info = self.env.step(action)
+        with PROFILER.stage('wrapper.frame_stack'):
+            if self.pos + 1 == len(self.buffer):
+                self.buffer[:self.k - 1] = self.buffer[len(self.buffer) - self.k + 1:]
+                self.pos = self.k - 2
+            self.pos += 1
+            self.buffer[self.pos] = ob.reshape(self.buffer.shape[1:])
+            return self._get_ob(), reward, done, info
+
+    def latest_frame(self):
+        return self.buffer[self.pos]
+
+    def _get_ob(self):
+        ob = self.buffer[self.pos - self.k + 1:self.pos + 1]
+        if self.channels_last:
+            ob = ob.transpose(1, 2, 0)
+        return ob.copy() if self.copy else ob  # the rows are contiguous, so ascontiguousarray would not copy
+
+def make_dino(env, timer=True, frame_stack=True, ring_buffer=False):
+    # envs made with capture='gray' already warp frames inside the browser
+    if env.observation_space.shape != (80, 160, 1):
+        env = WarpFrame(env, 160, 80)
     if timer:
         env = TimerEnv(env)
     if frame_stack:
-        env = FrameStack(env, 4)
+        env = RingFrameStack(env, 4) if ring_buffer else FrameStack(env, 4)
     return env
\ No newline at end of file
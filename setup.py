@@ -34,6 +34,12 @@ setup(
         'requests>=2.9.1', 
         'selenium>=3.14.1'
     ], 
+    entry_points={
+        'console_scripts': [
+            'chrome-dino-benchmark=gym_chrome_dino.benchmarks:main', 
+            'chrome-dino-server=gym_chrome_dino.envs.server:main', 
+        ], 
+    }, 
     license='MIT', 
     zip_safe=False
 )
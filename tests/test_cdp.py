@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import pytest
+
+from gym_chrome_dino.game import cdp
+from gym_chrome_dino.game.cdp import CDPDinoGame, CDPError
+from gym_chrome_dino.game.mock_cdp import MockCDPServer
+
+N_OBSTACLES = 3
+STATE = [50, 93, 6, 0, 1, 42, 1, 0, 0, 0] + [1, 300, 105, 34, 35, 0] + [0, 600, 150, 0, 0, 0] * (N_OBSTACLES - 1)
+
+
+def handler(method, params):
+    if method != 'Runtime.evaluate':
+        return {}
+    expression = params['expression']
+    if 'return [__dinoState' in expression:
+        return {'result': {'type': 'object', 'value': [STATE, None, None, 1]}}
+    if '__dinoState' in expression:
+        return {'result': {'type': 'object', 'value': STATE}}
+    if 'throw' in expression:
+        return {'result': {}, 'exceptionDetails': {'text': 'Uncaught', 'exception': {'description': 'Error: boom'}}}
+    return {'result': {'type': 'boolean', 'value': True}}
+
+
+@pytest.fixture
+def game():
+    server = MockCDPServer(handler)
+    game = CDPDinoGame(ws_url=server.ws_url, n_obstacles=N_OBSTACLES)
+    yield game, server
+    game.close()
+    server.close()
+
+
+def test_step_reads_the_state(game):
+    game, _ = game
+    state, image = game.step('UP')
+    assert image is None
+    assert state['score'] == 42 and state['num_obstacles'] == 1
+    assert state['obstacles'][0]['width'] == 34
+
+
+def test_step_pipelines_keys_and_script(game, monkeypatch):
+    game, server = game
+    log = []
+    send, result = game.cdp.send, cdp.PendingCommand.result
+
+    def logged_send(method, params=None):
+        log.append(('send', method))
+        return send(method, params)
+
+    def logged_result(self, timeout=None):
+        log.append(('wait', self.method))
+        return result(self, timeout)
+    monkeypatch.setattr(game.cdp, 'send', logged_send)
+    monkeypatch.setattr(cdp.PendingCommand, 'result', logged_result)
+    del server.messages[:]
+    game.step('UP')
+    assert log[:4] == [('send', 'Input.dispatchKeyEvent'), ('send', 'Input.dispatchKeyEvent'),
+                       ('send', 'Runtime.evaluate'), ('wait', 'Runtime.evaluate')]
+    assert [m['params'].get('type') for m in server.messages[:2]] == ['rawKeyDown', 'keyUp']
+    assert server.messages[2]['method'] == 'Runtime.evaluate'
+
+
+def test_script_errors_raise(game):
+    game, _ = game
+    with pytest.raises(CDPError, match='boom'):
+        game.execute('throw new Error("boom");')
+
+
+def test_rejected_key_raises(game):
+    game, server = game
+
+    def reject_keys(method, params):
+        if method == 'Input.dispatchKeyEvent':
+            raise ValueError('no input')
+        return handler(method, params)
+    server.handler = reject_keys
+    with pytest.raises(CDPError, match='no input'):
+        game.step('UP')
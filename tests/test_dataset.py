@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import cv2
+import numpy as np
+import pytest
+
+from gym_chrome_dino.utils.dataset import TrajectoryDataset, warp_frames
+from gym_chrome_dino.utils.recording import EpisodeRecorder
+
+LENGTHS = [10, 6]
+
+
+@pytest.fixture
+def directory(tmp_path):
+    # frame t of episode e is filled with 100 * e + t, the reward of step t is t
+    recorder = EpisodeRecorder(str(tmp_path))
+    for e, n in enumerate(LENGTHS):
+        recorder.begin(np.full((3, 5, 1), 100 * e, dtype=np.uint8))
+        for t in range(1, n):
+            recorder.add(np.full((3, 5, 1), 100 * e + t, dtype=np.uint8), t % 3, float(t), t == n - 1)
+    recorder.close()
+    return str(tmp_path)
+
+
+def test_batch(directory):
+    dataset = TrajectoryDataset(directory, frame_stack=3, n_step=2, gamma=.5, warp=False)
+    t = np.array([0, 1, 7, 8, 10, 13])  # global steps, episode 1 starts at 10 and ends at 15
+    batch = dataset.batch(t)
+    assert batch.observations.shape == (6, 3, 5, 3)
+    assert batch.observations[:, 0, 0].tolist() == [[0, 0, 0], [0, 0, 1], [5, 6, 7], [6, 7, 8],
+                                                    [100, 100, 100], [101, 102, 103]]
+    assert batch.actions.tolist() == [1, 2, 2, 0, 1, 1]
+    assert batch.returns.tolist() == [1 + 2 * .5, 2 + 3 * .5, 8 + 9 * .5, 9, 1 + 2 * .5, 4 + 5 * .5]
+    assert batch.dones.tolist() == [False, False, True, True, False, True]
+    assert batch.discounts.tolist() == [.25, .25, 0., 0., .25, 0.]
+    assert batch.next_observations[:, 0, 0, -1].tolist() == [2, 3, 9, 9, 102, 105]
+
+
+def test_epoch_covers_every_transition(directory):
+    dataset = TrajectoryDataset(directory, batch_size=4, warp=False, drop_last=False, seed=0)
+    assert len(dataset) == 4
+    actions = np.concatenate([batch.actions for batch in dataset])
+    assert len(actions) == sum(LENGTHS) - len(LENGTHS)
+    first = np.concatenate([batch.observations[:, 0, 0, -1] for batch in dataset])
+    assert sorted(first) == sorted(list(range(9)) + list(range(100, 105)))
+
+
+def test_warp_frames_matches_cv2():
+    frames = np.random.RandomState(0).randint(0, 256, size=(3, 150, 600, 3)).astype(np.uint8)
+    expected = [cv2.resize(cv2.cvtColor(f, cv2.COLOR_RGB2GRAY), (160, 80), interpolation=cv2.INTER_AREA)
+                for f in frames]
+    assert np.abs(warp_frames(frames).astype(int) - np.array(expected)).max() <= 1
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import os
+
+import numpy as np
+
+from gym_chrome_dino.game.state import state_dtype
+from gym_chrome_dino.utils.recording import EpisodeReader, EpisodeRecorder
+
+
+def record(recorder, n, value=0, state=None):
+    frames = [np.full((4, 6, 1), value + t // 2, dtype=np.uint8) for t in range(n + 1)]
+    recorder.begin(frames[0], state)
+    for t in range(1, n + 1):
+        recorder.add(frames[t], t % 3, 1., t == n, state)
+    recorder.end()
+    return frames
+
+
+def test_round_trip(tmp_path):
+    state = np.zeros((), dtype=state_dtype(3))
+    recorder = EpisodeRecorder(str(tmp_path), chunk_size=4)
+    frames = [record(recorder, 9, state=state), record(recorder, 5, value=100)]
+    recorder.close()
+    reader = EpisodeReader(str(tmp_path))
+    assert len(reader) == 2
+    for episode, expected in zip(reader, frames):
+        assert len(episode) == len(expected)
+        assert np.array_equal(episode.observations, np.stack(expected))
+        assert episode.actions[0] == -1 and episode.dones[-1]
+    assert len(reader[0].frames) == 5  # repeated frames are stored once
+    assert reader[0].steps.dtype.names[-1] == 'state'
+
+
+def test_orphaned_segments_are_not_appended_to(tmp_path):
+    # the segments of an episode that a crashed recorder never indexed
+    for suffix in ('.frames', '.steps'):
+        with open(os.path.join(str(tmp_path), 'episode_000000' + suffix), 'wb') as f:
+            f.write(b'\xff' * 13)
+    recorder = EpisodeRecorder(str(tmp_path))
+    frames = record(recorder, 6)
+    recorder.close()
+    episode = EpisodeReader(str(tmp_path))[0]
+    assert episode.name != 'episode_000000'
+    assert np.array_equal(episode.observations, np.stack(frames))
+
+
+def test_recorders_sharing_a_directory(tmp_path):
+    a, b = EpisodeRecorder(str(tmp_path)), EpisodeRecorder(str(tmp_path))
+    frames = {}
+    for i in range(3):
+        frames['a', i] = record(a, 4 + i, value=10 * i)
+        a.flush()
+        frames['b', i] = record(b, 7 + i, value=10 * i + 5)
+        b.flush()
+    a.close()
+    b.close()
+    reader = EpisodeReader(str(tmp_path))
+    assert len(reader) == 6
+    assert len(set(entry['name'] for entry in reader.entries)) == 6
+    observations = sorted(episode.observations.tobytes() for episode in reader)
+    assert observations == sorted(np.stack(f).tobytes() for f in frames.values())
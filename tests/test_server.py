@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import os
+
+import numpy as np
+import pytest
+
+import gym
+import gym_chrome_dino
+from gym_chrome_dino.envs import ChromeDinoGAEnv, EnvClient, EnvServer, RemoteEnv, make_env_fns
+from gym_chrome_dino.envs.server import EnvServerError
+from gym_chrome_dino.game.cdp import CDPDinoGame
+from gym_chrome_dino.game.mock_cdp import MockCDPServer
+
+from test_cdp import N_OBSTACLES, handler
+
+
+def actions(n):
+    return [1 if t % 25 == 0 else 0 for t in range(n)]
+
+
+@pytest.fixture(params=['unix', 'tcp'])
+def server(request, tmp_path):
+    address = os.path.join(str(tmp_path), 'dino.sock') if request.param == 'unix' else ('127.0.0.1', 0)
+    server = EnvServer(make_env_fns('ChromeDinoGASim-v0', 2, seed=3), address).start()
+    yield server
+    server.close()
+
+
+def test_remote_env_matches_local_env(server):
+    local = gym.make('ChromeDinoGASim-v0', seed=3)
+    remote = RemoteEnv(server.address)
+    try:
+        assert remote.observation_space == local.observation_space
+        assert np.array_equal(remote.reset(), local.reset())
+        for action in actions(200):
+            a, b = remote.step(action), local.step(action)
+            assert np.array_equal(a[0], b[0]) and a[1:3] == b[1:3]
+            if a[2]:
+                break
+        assert remote.get_score() == local.unwrapped.get_score()
+    finally:
+        remote.close()
+
+
+def test_batched_client(server):
+    client = EnvClient(server.address)
+    try:
+        ids = client.attach(2)
+        observations = client.reset(ids)
+        assert observations.shape == (2, 7)
+        observations, rewards, dones, infos = client.step(ids, [0, 1])
+        assert observations.shape == (2, 7) and rewards.shape == dones.shape == (2,) and len(infos) == 2
+        with pytest.raises(EnvServerError):
+            client.attach(1)  # all envs are leased
+    finally:
+        client.close()
+    client = EnvClient(server.address)  # leases end with the connection
+    try:
+        assert len(client.attach(2)) == 2
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('method', ['close', '__class__', 'set_parameter', '_observe'])
+def test_call_whitelist(server, method):
+    client = EnvClient(server.address)
+    try:
+        ids = client.attach(1)
+        assert client.call(ids, 'get_action_meanings') == [['NOOP', 'UP', 'DOWN']]
+        with pytest.raises(EnvServerError, match='not allowed'):
+            client.call(ids, method)
+    finally:
+        client.close()
+
+
+def test_server_over_mock_cdp(tmp_path):
+    mock = MockCDPServer(handler)
+    make_env = lambda: ChromeDinoGAEnv(False, False, False, game=CDPDinoGame(ws_url=mock.ws_url,
+                                                                             n_obstacles=N_OBSTACLES))
+    server = EnvServer([make_env], os.path.join(str(tmp_path), 'dino.sock')).start()
+    remote = RemoteEnv(server.address)
+    try:
+        remote.reset()
+        observation, reward, done, _ = remote.step(1)
+        assert observation[4] == 17 and reward == 42 and not done  # a group of two small cacti ahead
+    finally:
+        remote.close()
+        server.close()
+        mock.close()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import numpy as np
+import pytest
+
+import gym
+import gym_chrome_dino
+from gym_chrome_dino.game.dino_sim import DinoSim
+from gym_chrome_dino.game.policy import act, linear_policy
+from gym_chrome_dino.game.state import structured_bounds
+
+# jumps when the nearest obstacle is less than 100px ahead
+JUMPER = linear_policy([[0] * 7, [-.01] + [0] * 6, [0] * 7], [0., 1., -1.])
+
+
+def run(env, policy=None, max_steps=5000):
+    observations = [env.reset()]
+    done, reward = False, 0
+    while not done and len(observations) <= max_steps:
+        action = act(policy, observations[-1]) if policy is not None else 0
+        observation, reward, done, _ = env.step(action)
+        observations.append(observation)
+    return np.array(observations), reward, done
+
+
+def make(env_id='ChromeDinoGASim-v0', seed=None, **kwargs):
+    env = gym.make(env_id, **kwargs)
+    env.seed(seed)
+    return env
+
+
+def test_noop_episode_ends():
+    observations, score, done = run(make())
+    assert done and 100 < len(observations) < 1000
+    assert score > 0
+
+
+def test_seed_reproduces_episodes():
+    a, score_a, _ = run(make(seed=3), JUMPER)
+    b, score_b, _ = run(make(seed=3), JUMPER)
+    c, _, _ = run(make(seed=4), JUMPER)
+    assert np.array_equal(a, b) and score_a == score_b
+    assert not np.array_equal(a[:len(c)], c[:len(a)])
+
+
+def test_jumping_beats_noop():
+    _, noop, _ = run(make(seed=0))
+    _, jumper, _ = run(make(seed=0), JUMPER)
+    assert jumper > noop
+
+
+def test_clone_and_restore_state():
+    env = make(seed=1)
+    env.reset()
+    for t in range(60):
+        env.step(1 if t % 25 == 0 else 0)
+    snapshot = env.unwrapped.clone_state()
+    first = [env.step(t % 3)[0] for t in range(80)]
+    assert np.array_equal(env.unwrapped.restore_state(snapshot), snapshot['observation'])
+    second = [env.step(t % 3)[0] for t in range(80)]
+    assert np.array_equal(first, second)
+
+
+def test_frame_skip_repeats_the_action():
+    skip, single = make(seed=2, frame_skip=3), make(seed=2)
+    assert np.array_equal(skip.reset(), single.reset())
+    for t in range(150):
+        action = 1 if t % 20 == 0 else 0
+        observation, _, done, _ = skip.step(action)
+        for _ in range(3):
+            expected, _, single_done, _ = single.step(action)
+            if single_done:
+                break
+        assert np.array_equal(observation, expected)
+        assert done == single_done
+        if done:
+            break
+
+
+def test_evaluate_matches_env_steps():
+    policies = [JUMPER, linear_policy(np.zeros((3, 7)))]
+    game = DinoSim(frames_per_step=2)
+    scores, steps = game.evaluate(policies, seed=7)
+    for policy, score, n in zip(policies, scores, steps):
+        observations, reward, _ = run(make(seed=7, frames_per_step=2), policy)
+        assert (reward, len(observations) - 1) == (score, n)
+
+
+def test_pixels():
+    env = make('ChromeDinoSim-v0', seed=0, capture='gray')
+    observation = env.reset()
+    assert observation.shape == env.observation_space.shape == (80, 160, 1)
+    assert observation.dtype == np.uint8 and observation.min() < observation.max()
+
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_structured_observation(normalize):
+    env = make('ChromeDinoGAStructuredSim-v0', seed=0, normalize=normalize)
+    observations = [env.reset()]
+    for t in range(300):
+        observation, _, done, _ = env.step(1 if t % 30 == 0 else 0)
+        observations.append(observation)
+        if done:
+            break
+    observations = np.array(observations)
+    assert all(env.observation_space.contains(o) for o in observations)
+    widths = observations[:, 5 + 3]
+    if not normalize:
+        assert set(widths[widths > 0]) <= {17., 25., 34., 46., 50., 51., 75.}
+
+
+def test_structured_bounds_are_cached():
+    low, high = structured_bounds(3)
+    assert structured_bounds(3)[0] is low
+    assert not low.flags.writeable and (low < high).all()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import subprocess
+import sys
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from gym_chrome_dino.envs import ChromeDinoGAEnv, SupervisedEnv
+from gym_chrome_dino.envs.supervisor import close_game
+from gym_chrome_dino.utils.helpers import _descendants
+
+
+def play(env):
+    env.reset()
+    done, n = False, 0
+    while not done:
+        done = env.step(0)[2]
+        n += 1
+    return n
+
+
+@pytest.fixture
+def env():
+    env = SupervisedEnv(ChromeDinoGAEnv(False, False, False, backend='sim'), max_episodes=2, standby=False,
+                        timeout=.5)
+    yield env
+    env.close()
+
+
+def test_recycles_after_max_episodes(env):
+    games = []
+    for _ in range(5):
+        play(env)
+        games.append(env.unwrapped.game)
+    assert env.recycles == {'episodes': 2}
+    assert len(set(map(id, games))) == 3
+
+
+def dead(action):
+    raise WebDriverException('dead')
+
+
+def test_lost_game_ends_the_episode(env, monkeypatch):
+    monkeypatch.setattr(env.unwrapped, 'step', dead)
+    with pytest.raises(WebDriverException):  # there is no episode to end before the first reset
+        env.step(0)
+    monkeypatch.undo()
+    env.reset()
+    assert env.recycles == {'lost': 1}  # the game still counts as lost
+    monkeypatch.setattr(env.unwrapped, 'step', dead)
+    observation, reward, done, info = env.step(0)
+    assert done and 'dead' in info['game_lost'] and observation is not None
+    monkeypatch.undo()
+    play(env)
+    assert env.recycles == {'lost': 2}
+
+
+def test_hung_game_times_out(env, monkeypatch):
+    env.reset()
+    monkeypatch.setattr(env.unwrapped, 'step', lambda action: time.sleep(5))
+    start = time.perf_counter()
+    _, _, done, info = env.step(0)
+    assert time.perf_counter() - start < 2
+    assert done and 'TimeoutException' in info['game_lost']
+    monkeypatch.undo()
+    assert play(env) > 0
+    assert env.recycles == {'lost': 1}
+
+
+class HungGame():
+    def __init__(self):
+        # a parent with a child, like chromedriver and Chrome
+        self.process = subprocess.Popen([sys.executable, '-c', 'import subprocess, sys, time; '
+                                         'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); '
+                                         'time.sleep(60)'])
+
+    def close(self):
+        time.sleep(60)
+
+
+def alive(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads the process tree from /proc')
+def test_close_game_kills_a_hung_browser():
+    game = HungGame()
+    deadline = time.time() + 5
+    while len(_descendants(game.process.pid)) < 2 and time.time() < deadline:
+        time.sleep(.05)
+    parent, child = _descendants(game.process.pid)
+    close_game(game, timeout=.2)
+    game.process.wait(5)
+    while alive(child) and time.time() < deadline + 5:
+        time.sleep(.05)
+    assert not alive(child)
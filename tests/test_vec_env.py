@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import numpy as np
+import pytest
+
+from gym_chrome_dino.envs import ChromeDinoSimVecEnv, SubprocChromeDinoVecEnv, make_env_fns
+
+
+def rollout(env, steps=400, seed=None):
+    rng = np.random.RandomState(0)
+    observations = [env.reset(seed=seed)]
+    dones = []
+    for _ in range(steps):
+        observation, _, done, info = env.step(rng.randint(3, size=env.num_envs) * (rng.rand(env.num_envs) < .1))
+        observations.append(observation)
+        dones.append(done)
+        for i in np.flatnonzero(done):
+            assert info[i]['terminal_observation'].shape == env.single_observation_space.shape
+    return np.array(observations), np.array(dones)
+
+
+@pytest.mark.parametrize('observation', ['features', 'pixels'])
+def test_sim_vec_env_spaces(observation):
+    env = ChromeDinoSimVecEnv(3, observation=observation)
+    observations, dones = rollout(env, steps=50)
+    assert observations.shape[1:] == env.observation_space.shape
+    assert all(env.single_observation_space.contains(o) for o in observations[:, 0])
+
+
+def test_sim_vec_env_reset_contract():
+    env = ChromeDinoSimVecEnv(4)
+    observations, infos = env.reset(seed=1, return_info=True)
+    assert observations.shape == (4, 7) and infos == [{}] * 4
+    assert isinstance(env.reset(), np.ndarray)
+
+
+def test_sim_vec_env_seed():
+    a, dones = rollout(ChromeDinoSimVecEnv(4), seed=1)
+    b, _ = rollout(ChromeDinoSimVecEnv(4), seed=1)
+    c, _ = rollout(ChromeDinoSimVecEnv(4), seed=2)
+    assert dones.any()  # games crashed and were reset in place
+    assert np.array_equal(a, b)
+    assert not np.array_equal(a, c)
+
+
+def test_subproc_vec_env():
+    env = SubprocChromeDinoVecEnv(make_env_fns('ChromeDinoGASim-v0', 2))
+    try:
+        observations, infos = env.reset(seed=5, return_info=True)
+        assert observations.shape == (2, 7) and len(infos) == 2
+        a, dones = rollout(env, seed=5)
+        b, _ = rollout(env, seed=5)
+        assert dones.any()
+        assert np.array_equal(a, b)
+        assert len(env.call('get_score')) == 2
+    finally:
+        env.close()
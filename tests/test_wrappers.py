@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 Elvis Yu-Jing Lin <elvisyjlin@gmail.com>
+# Licensed under the MIT License - https://opensource.org/licenses/MIT
+
+import numpy as np
+import pytest
+
+import gym
+from gym import spaces
+
+from gym_chrome_dino.utils.atari_wrappers import FrameStack
+from gym_chrome_dino.utils.wrappers import RingFrameStack
+
+
+class CountingEnv(gym.Env):
+    """Frames filled with the step number."""
+
+    observation_space = spaces.Box(low=0, high=255, shape=(4, 6, 1), dtype=np.uint8)
+    action_space = spaces.Discrete(2)
+
+    def reset(self):
+        self.t = 0
+        return self._frame()
+
+    def step(self, action):
+        self.t += 1
+        return self._frame(), 0., False, {}
+
+    def _frame(self):
+        return np.full(self.observation_space.shape, self.t, dtype=np.uint8)
+
+
+@pytest.mark.parametrize('channels_last', [True, False])
+def test_ring_frame_stack_copies_outlive_the_buffer(channels_last):
+    env = RingFrameStack(CountingEnv(), 4, spare=3, channels_last=channels_last)
+    obs = [env.reset()] + [env.step(0)[0] for _ in range(20)]
+    assert not np.shares_memory(obs[-1], env.buffer)
+    for t, ob in enumerate(obs):
+        frames = ob.transpose(2, 0, 1) if channels_last else ob
+        expected = [max(t - 3 + i, 0) for i in range(4)]
+        assert [frame[0, 0] for frame in frames] == expected
+
+
+def test_ring_frame_stack_matches_frame_stack():
+    ring, stack = RingFrameStack(CountingEnv(), 4, spare=2), FrameStack(CountingEnv(), 4)
+    assert np.array_equal(ring.reset(), np.asarray(stack.reset()))
+    for _ in range(10):
+        assert np.array_equal(ring.step(0)[0], np.asarray(stack.step(0)[0]))
+        assert ring.observation_space.shape == ring._get_ob().shape
+
+
+def test_ring_frame_stack_views():
+    env = RingFrameStack(CountingEnv(), 4, spare=3, copy=False)
+    ob = env.reset()
+    assert np.shares_memory(ob, env.buffer)